@@ -10,10 +10,18 @@ GALAXY_API_KEY = os.getenv("GALAXY_API_KEY")
 NEO4J_URI = os.getenv("NEO4J_URI")
 NEO4J_USER = os.getenv("NEO4J_USER")
 NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
+NEO4J_DATABASE = os.getenv("NEO4J_DATABASE") or None  # None: the server's default database
+NEO4J_MAX_CONNECTION_POOL_SIZE = int(os.getenv("NEO4J_MAX_CONNECTION_POOL_SIZE", "100"))
+# Initial rows per UNWIND batch; Neo4jManager.execute_batch adapts it during a load
+NEO4J_BATCH_SIZE = int(os.getenv("NEO4J_BATCH_SIZE", "10000"))
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
 HF_EMBEDDING_URL = os.getenv("HF_EMBEDDING_URL")
 HF_API_TOKEN = os.getenv("HF_API_TOKEN")
+# Texts sent per HF Inference request when embedding in bulk
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
 
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
+
+DATA_CACHE_DIR = os.getenv("DATA_CACHE_DIR", "data/cache")
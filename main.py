@@ -1,9 +1,5 @@
 import argparse
 import sys
-from src.graph_db.graph_builder import GraphBuilder
-from src.community_detection.leiden import LeidenDetector
-from src.community_detection.summarizer import CommunitySummarizer
-from src.retrieval.search import GlobalSearch, LocalSearch, HybridSearch
 from src.utils.logger import get_logger
 
 logger = get_logger("main")
@@ -15,6 +11,11 @@ def build_pipeline():
     2. Detect Communities (Leiden)
     3. Summarize Communities (LLM)
     """
+    # Build-only dependencies (igraph, leidenalg, numpy, Gemini) are imported on demand
+    from src.graph_db.graph_builder import GraphBuilder
+    from src.community_detection.leiden import LeidenDetector
+    from src.community_detection.summarizer import CommunitySummarizer
+
     print("\n" + "="*50)
     print("Starting Galaxy GraphRAG Build Pipeline")
     print("="*50)
@@ -67,11 +68,13 @@ def run_query(query, mode="auto"):
     print("-" * 30)
 
     if mode == "global":
+        from src.retrieval.search import GlobalSearch
         searcher = GlobalSearch()
         result = searcher.search(query)
         print(f"Global Search Result:\n{result}")
     
     elif mode == "local":
+        from src.retrieval.search import LocalSearch
         searcher = LocalSearch()
         results = searcher.search(query)
         for i, res in enumerate(results):
@@ -80,6 +83,7 @@ def run_query(query, mode="auto"):
             
     elif mode == "hybrid":
     
+        from src.retrieval.search import HybridSearch
         searcher = HybridSearch()
         results = searcher.search(query) # No filter for now in simple CLI
         for i, res in enumerate(results):
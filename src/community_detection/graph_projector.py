@@ -1,121 +1,301 @@
-import networkx as nx
+import os
+from collections import namedtuple
+import igraph as ig
 import numpy as np
+import orjson
+from scipy import sparse
+from config import settings
 from src.graph_db.neo4j_manager import Neo4jManager
 from src.utils.logger import get_logger
-from sklearn.metrics.pairwise import cosine_similarity
+from src.utils.similarity import normalize_rows, similar_pairs
 
 logger = get_logger("graph_projector")
 
+EMBEDDING_DIM = 384
+
+EMBEDDINGS_CACHE_NAME = "tool_embeddings"
+EMBEDDINGS_QUERY = "MATCH (t:Tool) WHERE t.embedding IS NOT NULL RETURN t.id AS id, t.embedding AS embedding"
+# Cheap fingerprint of the Tool embeddings; GraphBuilder stamps `updated_at` on every load
+EMBEDDINGS_STAMP_QUERY = "MATCH (t:Tool) WHERE t.embedding IS NOT NULL RETURN count(t) AS n, max(t.updated_at) AS ts"
+
+# Result of GraphProjector.fetch_all_graph_data
+GraphData = namedtuple("GraphData", ["tool_ids", "matrix", "cooccurrences", "io_connections"])
+# Result of GraphProjector._read_embeddings: the full matrix plus what is needed to cache it
+EmbeddingsRead = namedtuple("EmbeddingsRead", ["stamp", "tool_ids", "matrix", "fresh"])
+
 class GraphProjector:
     def __init__(self):
-        self.neo4j = Neo4jManager()
+        self.neo4j = Neo4jManager.instance()
+        self._full_graph = None
 
-    def fetch_tool_embeddings(self):
-        """Fetches tool IDs and their embeddings."""
+    def fetch_tool_embeddings(self, filter_tool_ids=None):
+        """
+        Fetches tool IDs and their unit-normalized embeddings, optionally restricted to filter_tool_ids.
+        Returns:
+            list: Tool IDs
+            np.ndarray: float32 matrix of shape (len(ids), EMBEDDING_DIM), one row per ID
+        """
         logger.info("Fetching tool embeddings...")
-        query = "MATCH (t:Tool) WHERE t.embedding IS NOT NULL RETURN t.id AS id, t.embedding AS embedding"
-        results = self.neo4j.execute_query(query)
-        
-        tool_embeddings = {}
-        for r in results:
-            tool_embeddings[r['id']] = np.array(r['embedding'])
-        return tool_embeddings
+        embeddings = self.neo4j.execute_read(self._read_embeddings)
+        return self._finish_embeddings(embeddings, filter_tool_ids)
 
-    def fetch_workflow_cooccurrences(self):
+    def fetch_workflow_cooccurrences(self, filter_tool_ids=None):
         """Fetches pairs of tools that appear in the same workflow."""
         logger.info("Fetching workflow co-occurrences...")
-
-        query = """
-        MATCH (w:Workflow)-[:HAS_STEP]->(s1:WorkflowStep)-[:USES_TOOL]->(t1:Tool)
-        MATCH (w)-[:HAS_STEP]->(s2:WorkflowStep)-[:USES_TOOL]->(t2:Tool)
-        WHERE t1.id < t2.id 
-        RETURN t1.id AS source, t2.id AS target, count(w) AS weight
-        """
-        results = self.neo4j.execute_query(query)
+        results = self.neo4j.execute_query(self._cooccurrence_query(filter_tool_ids), self._filter_params(filter_tool_ids))
         return results
 
-    def fetch_io_connections(self):
+    def fetch_io_connections(self, filter_tool_ids=None):
         """Fetches pairs of tools connected by FileFormat."""
         logger.info("Fetching Input/Output connections...")
+        results = self.neo4j.execute_query(self._io_query(filter_tool_ids), self._filter_params(filter_tool_ids))
+        return results
+
+    def fetch_all_graph_data(self, filter_tool_ids=None):
+        """
+        Fetches embeddings, workflow co-occurrences and I/O connections
+        inside a single read transaction (one session, one round of Bolt overhead).
+        Returns:
+            GraphData: (tool_ids, matrix, cooccurrences, io_connections)
+        """
+        logger.info("Fetching tool embeddings, co-occurrences and I/O connections...")
+        params = self._filter_params(filter_tool_ids)
+        queries = [
+            self._cooccurrence_query(filter_tool_ids),
+            self._io_query(filter_tool_ids),
+        ]
+
+        def work(tx):
+            embeddings = self._read_embeddings(tx)
+            cooccurrences, io_conns = [list(tx.run(query, params)) for query in queries]
+            return embeddings, cooccurrences, io_conns
+
+        embeddings, cooccurrences, io_conns = self.neo4j.execute_read(work)
+        tool_ids, matrix = self._finish_embeddings(embeddings, filter_tool_ids)
+        return GraphData(tool_ids, matrix, cooccurrences, io_conns)
+
+    def _read_embeddings(self, tx):
+        """
+        Reads the full normalized embedding matrix inside `tx`.
+        The matrix is cached on disk and reused while the database, Tool count and
+        latest `updated_at` stamp are unchanged.
+        Returns:
+            EmbeddingsRead: (stamp, tool_ids, matrix, fresh); `fresh` marks a matrix not yet cached
+        """
+        stamp = self._cache_key(tx.run(EMBEDDINGS_STAMP_QUERY).single())
+        cached = self._load_cached_embeddings(stamp)
+        if cached is not None:
+            return EmbeddingsRead(stamp, *cached, fresh=False)
+        return EmbeddingsRead(stamp, *self._to_matrix(tx.run(EMBEDDINGS_QUERY)), fresh=True)
+
+    def _finish_embeddings(self, embeddings, filter_tool_ids=None):
+        """
+        Caches a freshly read matrix (outside the transaction, which the driver may retry),
+        then applies the topic filter as a row mask over the full matrix.
+        """
+        tool_ids, matrix = embeddings.tool_ids, embeddings.matrix
+        if embeddings.fresh:
+            self._save_cached_embeddings(embeddings.stamp, tool_ids, matrix)
+
+        if filter_tool_ids is not None:
+            keep = set(filter_tool_ids)
+            mask = np.fromiter((tid in keep for tid in tool_ids), dtype=bool, count=len(tool_ids))
+            tool_ids = [tid for tid, k in zip(tool_ids, mask) if k]
+            matrix = matrix[mask]
+        return tool_ids, matrix
+
+    @staticmethod
+    def _cache_paths():
+        base = os.path.join(settings.DATA_CACHE_DIR, EMBEDDINGS_CACHE_NAME)
+        return base + ".npy", base + ".json"
+
+    def _cache_key(self, stamp_record):
+        """
+        Identifies the embeddings of one database: URI, database name, Tool count and latest
+        `updated_at`. Returns None when the Tools carry no `updated_at` (loaded before it was
+        stamped), since re-embedding them would then go unnoticed.
+        """
+        if stamp_record["ts"] is None:
+            return None
+        return {
+            "uri": self.neo4j.uri,
+            "database": self.neo4j.database,
+            "count": stamp_record["n"],
+            "updated_at": stamp_record["ts"],
+        }
+
+    def _load_cached_embeddings(self, stamp):
+        """Returns (tool_ids, memory-mapped matrix) if the cache matches `stamp`, else None."""
+        if stamp is None:
+            return None
+        matrix_path, meta_path = self._cache_paths()
+        try:
+            with open(meta_path, "rb") as f:
+                meta = orjson.loads(f.read())
+            if any(meta[k] != v for k, v in stamp.items()):
+                return None
+            matrix = np.load(matrix_path, mmap_mode="r")
+        except (OSError, ValueError, KeyError):
+            return None
+
+        if matrix.shape != (len(meta["ids"]), EMBEDDING_DIM):
+            return None
+        logger.info(f"Loaded {len(meta['ids'])} tool embeddings from cache.")
+        return meta["ids"], matrix
+
+    def _save_cached_embeddings(self, stamp, tool_ids, matrix):
+        if stamp is None:
+            return
+        matrix_path, meta_path = self._cache_paths()
+        try:
+            os.makedirs(settings.DATA_CACHE_DIR, exist_ok=True)
+            np.save(matrix_path, matrix)
+            with open(meta_path, "wb") as f:
+                f.write(orjson.dumps({**stamp, "ids": tool_ids}))
+        except OSError as e:
+            logger.warning(f"Could not write embedding cache: {e}")
+
+    @staticmethod
+    def _cooccurrence_query(filter_tool_ids):
+        # Expand each workflow's steps once, then pair them up in list space.
+        # Weight is the number of step pairs using both tools, as with a (s1, s2) self-join.
+        query = """
+        MATCH (w:Workflow)-[:HAS_STEP]->(:WorkflowStep)-[:USES_TOOL]->(t:Tool)
+        """
+        if filter_tool_ids is not None:
+            query += "WHERE t.id IN $tool_ids\n"
+        query += """
+        WITH w, collect(t.id) AS tids
+        UNWIND range(0, size(tids) - 2) AS i
+        UNWIND range(i + 1, size(tids) - 1) AS j
+        WITH tids[i] AS a, tids[j] AS b
+        WHERE a <> b
+        RETURN CASE WHEN a < b THEN a ELSE b END AS source,
+               CASE WHEN a < b THEN b ELSE a END AS target,
+               count(*) AS weight
+        """
+        return query
+
+    @staticmethod
+    def _io_query(filter_tool_ids):
         query = """
         MATCH (t1:Tool)-[:PRODUCES_OUTPUT]->(f:FileFormat)<-[:ACCEPTS_INPUT]-(t2:Tool)
         WHERE t1.id <> t2.id
-        RETURN t1.id AS source, t2.id AS target, count(f) AS weight
         """
-        results = self.neo4j.execute_query(query)
-        return results
+        if filter_tool_ids is not None:
+            query += "AND t1.id IN $tool_ids AND t2.id IN $tool_ids\n"
+        query += "RETURN t1.id AS source, t2.id AS target, count(f) AS weight"
+        return query
 
-    def build_weighted_graph(self, filter_tool_ids=None):
-        """Builds a NetworkX graph with weighted edges."""
-        G = nx.Graph()
-        
-        # Semantic Similarity
-        embeddings = self.fetch_tool_embeddings()
-        
-        # Filter for valid 384-dim embeddings AND filter_tool_ids if provided
-        valid_tool_ids = []
-        valid_embeddings = []
-        expected_dim = 384
-        
-        for tid, emb in embeddings.items():
-            # Apply Topic Filter
-            if filter_tool_ids is not None and tid not in filter_tool_ids:
-                continue
-                
-            if len(emb) == expected_dim:
-                valid_tool_ids.append(tid)
-                valid_embeddings.append(emb)
+    @staticmethod
+    def _filter_params(filter_tool_ids):
+        """Query parameters for the optional server-side Tool ID filter."""
+        if filter_tool_ids is None:
+            return None
+        return {"tool_ids": list(filter_tool_ids)}
+
+    @staticmethod
+    def _to_matrix(results):
+        """Keeps valid 384-dim embeddings, then builds the unit-normalized float32 matrix in a single call."""
+        tool_ids = []
+        vectors = []
+        for r in results:
+            emb = r['embedding']
+            if len(emb) == EMBEDDING_DIM:
+                tool_ids.append(r['id'])
+                vectors.append(emb)
             else:
-                logger.warning(f"Skipping tool {tid}: Dimension mismatch")
+                logger.warning(f"Skipping tool {r['id']}: Dimension mismatch")
+        
+        matrix = np.asarray(vectors, dtype=np.float32).reshape(-1, EMBEDDING_DIM)
+
+        # Unit-normalize once so cosine similarity is a plain inner product
+        return tool_ids, normalize_rows(matrix)
+
+    def build_full_weighted_graph(self, refresh=False):
+        """Builds the weighted graph over all Tools once and caches it on the projector."""
+        if self._full_graph is None or refresh:
+            self._full_graph = self._build_graph()
+        return self._full_graph
+
+    def build_weighted_graph(self, filter_tool_ids=None):
+        """
+        Returns an igraph graph with weighted edges. Vertex 'name' holds the Tool ID.
+        With filter_tool_ids, returns the subgraph induced by those Tools on the cached
+        full graph, which has exactly the edges a filtered build would produce.
+        Either way the caller gets its own graph, so mutating it leaves the cache intact.
+        """
+        G = self.build_full_weighted_graph()
+        if filter_tool_ids is None:
+            return G.copy()
+        return G.induced_subgraph(G.vs.select(name_in=set(filter_tool_ids)))
+
+    def _build_graph(self):
+        """Builds an igraph graph with weighted edges over all Tools from Neo4j."""
+        tool_ids, matrix, cooccurrences, io_conns = self.fetch_all_graph_data()
         
-        tool_ids = valid_tool_ids
         if not tool_ids:
             logger.error("No valid embeddings found.")
-            return G
+            return ig.Graph()
 
-        matrix = np.array(valid_embeddings)
+        index = {tid: i for i, tid in enumerate(tool_ids)}
+        n = len(tool_ids)
         
-        # Add nodes
-        G.add_nodes_from(tool_ids)
+        # Each signal becomes a COO triple (rows, cols, weights) over (low, high) vertex indices
         
-        # Calculate Cosine Similarity 
+        # Calculate Cosine Similarity (rows are already unit-normalized)
         logger.info("Calculating semantic similarity...")
-        if len(tool_ids) > 0:
-            sim_matrix = cosine_similarity(matrix)
-            threshold = 0.7 
-            
-            rows, cols = np.where(sim_matrix > threshold)
-            for r, c in zip(rows, cols):
-                if r < c: # Upper triangle
-                    weight = sim_matrix[r, c]
-                    G.add_edge(tool_ids[r], tool_ids[c], weight=weight, type='semantic')
+        threshold = 0.7 
+        semantic = self._to_sparse(n, *similar_pairs(matrix, threshold))
 
         # Workflow Co-occurrence
-        cooccurrences = self.fetch_workflow_cooccurrences()
-        for row in cooccurrences:
-            u, v, w = row['source'], row['target'], row['weight']
-            
-            # Only add if nodes exist (might be filtered out)
-            if u in tool_ids and v in tool_ids:
-                if G.has_edge(u, v):
-                    G[u][v]['weight'] += w * 1.0 
-                else:
-                    G.add_edge(u, v, weight=w * 1.0, type='workflow')
+        workflow = self._to_sparse(n, *self._index_edges(index, cooccurrences, 1.0))
 
         # I/O Connections
-        io_conns = self.fetch_io_connections()
-        for row in io_conns:
-            u, v, w = row['source'], row['target'], row['weight']
-            
-            # Only add if nodes exist
-            if u in tool_ids and v in tool_ids:
-                if G.has_edge(u, v):
-                    G[u][v]['weight'] += w * 0.5 
-                else:
-                    G.add_edge(u, v, weight=w * 0.5, type='io')
+        io = self._to_sparse(n, *self._index_edges(index, io_conns, 0.5))
+
+        # Weights of parallel signals add up; the type is the first signal present (semantic > workflow > io)
+        combined = (semantic + workflow + io).tocoo()
+        flags = ((semantic != 0) * 4 + (workflow != 0) * 2 + (io != 0)).tocoo()
+        edge_type = np.where(flags.data >= 4, 'semantic', np.where(flags.data >= 2, 'workflow', 'io'))
+                
+        G = ig.Graph(
+            n=n,
+            edges=np.column_stack((combined.row, combined.col)).tolist(),
+            directed=False,
+            vertex_attrs={'name': tool_ids},
+            edge_attrs={
+                'weight': combined.data.tolist(),
+                'type': edge_type.tolist()
+            }
+        )
                 
-        logger.info(f"Built graph with {G.number_of_nodes()} nodes and {G.number_of_edges()} edges.")
+        logger.info(f"Built graph with {G.vcount()} nodes and {G.ecount()} edges.")
         return G
 
+    @staticmethod
+    def _index_edges(index, rows, coef):
+        """Maps (source, target, weight) rows to (low, high) vertex index arrays, skipping filtered-out tools."""
+        pairs = []
+        weights = []
+        for row in rows:
+            # Only add if nodes exist (might be filtered out)
+            u = index.get(row['source'])
+            v = index.get(row['target'])
+            if u is None or v is None:
+                continue
+            pairs.append((u, v) if u < v else (v, u))
+            weights.append(row['weight'] * coef)
+        
+        pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+        return pairs[:, 0], pairs[:, 1], np.asarray(weights, dtype=np.float64)
+
+    @staticmethod
+    def _to_sparse(n, rows, cols, weights):
+        """Upper-triangular CSR adjacency with duplicate (row, col) entries summed."""
+        adjacency = sparse.coo_matrix((weights.astype(np.float64), (rows, cols)), shape=(n, n)).tocsr()
+        adjacency.sum_duplicates()
+        return adjacency
+
     def close(self):
         self.neo4j.close()
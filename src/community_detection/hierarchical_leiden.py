@@ -1,6 +1,5 @@
+from concurrent.futures import ProcessPoolExecutor
 import leidenalg
-import igraph as ig
-import networkx as nx
 from src.community_detection.universal_projector import UniversalGraphProjector
 from src.community_detection.graph_projector import GraphProjector
 from src.graph_db.neo4j_manager import Neo4jManager
@@ -8,6 +7,34 @@ from src.utils.logger import get_logger
 
 logger = get_logger("hierarchical_leiden")
 
+# Community write-back rows are tiny, so commit them in large chunks (one transaction each)
+WRITE_BATCH_SIZE = 10000
+# Rows per server-side transaction when clearing the previous run's communities
+CLEANUP_BATCH_SIZE = 5000
+
+def _leiden_partition(ig_graph, resolution=1.0):
+    """
+    Runs Leiden on an igraph graph whose vertex 'name' is the node ID.
+    Module-level so it can be shipped to worker processes.
+    Returns:
+        dict: {node_id: community_id}
+    """
+    if ig_graph.vcount() == 0:
+        return {}
+        
+    if "weight" not in ig_graph.edge_attributes():
+        ig_graph.es["weight"] = [1.0] * ig_graph.ecount()
+        
+    partition = leidenalg.find_partition(
+        ig_graph, 
+        leidenalg.RBConfigurationVertexPartition, 
+        weights=ig_graph.es["weight"],
+        resolution_parameter=resolution
+    )
+    
+    # Map: node_id -> community_id
+    return dict(zip(ig_graph.vs["name"], partition.membership))
+
 class HierarchicalLeiden:
     """
     Implements the 2-Level Heterogeneous Community Detection.
@@ -17,47 +44,36 @@ class HierarchicalLeiden:
     def __init__(self):
         self.universal_projector = UniversalGraphProjector()
         self.tool_projector = GraphProjector()
-        self.neo4j = Neo4jManager()
+        self.neo4j = Neo4jManager.instance()
 
-    def _run_leiden_on_graph(self, nx_graph, resolution=1.0):
-        """Helper to run Leiden on a NetworkX graph."""
-        if nx_graph.number_of_nodes() == 0:
-            return {}
-            
-        ig_graph = ig.Graph.from_networkx(nx_graph)
-        if "weight" not in ig_graph.edge_attributes():
-            ig_graph.es["weight"] = [1.0] * ig_graph.ecount()
-            
-        partition = leidenalg.find_partition(
-            ig_graph, 
-            leidenalg.RBConfigurationVertexPartition, 
-            weights=ig_graph.es["weight"],
-            resolution_parameter=resolution
-        )
-        
-        # Map: node_id -> community_id
-        results = {}
-        for comm_id, nodes in enumerate(partition):
-            for node_idx in nodes:
-                original_id = ig_graph.vs[node_idx]["_nx_name"]
-                results[original_id] = comm_id
-        return results
+    def _run_leiden_on_graph(self, ig_graph, resolution=1.0):
+        """Helper to run Leiden on an igraph graph whose vertex 'name' is the node ID."""
+        return _leiden_partition(ig_graph, resolution)
 
-    def run_hierarchical_detection(self):
+    def run_hierarchical_detection(self, max_workers=None):
+        """Runs both levels; Level 2 partitions run in up to `max_workers` processes (default: CPU count)."""
         logger.info("Starting Hierarchical Community Detection...")
         
+        # Unique constraints back the id lookups of the community write-back below
+        self.neo4j.create_constraints([
+            "CREATE CONSTRAINT IF NOT EXISTS FOR (c:Community) REQUIRE c.id IS UNIQUE",
+            "CREATE CONSTRAINT IF NOT EXISTS FOR (sub:SubCommunity) REQUIRE sub.id IS UNIQUE",
+        ])
+        
         # --- Cleanup: Remove existing communities ---
+        # Committed in chunks of CLEANUP_BATCH_SIZE rows instead of one large transaction.
+        # CALL ... IN TRANSACTIONS needs an auto-commit query, which execute_query runs.
         logger.info("Cleaning up existing community nodes...")
-        cleanup_query = """
+        cleanup_query = f"""
         MATCH (n) WHERE n:Community OR n:SubCommunity OR n:Topic
-        DETACH DELETE n
+        CALL {{ WITH n DETACH DELETE n }} IN TRANSACTIONS OF {CLEANUP_BATCH_SIZE} ROWS
         """
         self.neo4j.execute_query(cleanup_query)
         
         # Also remove properties from Tool/Workflow
-        cleanup_props = """
+        cleanup_props = f"""
         MATCH (n) WHERE n:Tool OR n:Workflow
-        REMOVE n.communityId, n.subCommunityId, n.topicId
+        CALL {{ WITH n REMOVE n.communityId, n.subCommunityId, n.topicId }} IN TRANSACTIONS OF {CLEANUP_BATCH_SIZE} ROWS
         """
         self.neo4j.execute_query(cleanup_props)
 
@@ -85,42 +101,50 @@ class HierarchicalLeiden:
         logger.info(f"[Level 1] Found {len(communities)} Communities.")
 
         # --- Level 2: Local Refinement ---
+        # Build the full tool graph once; each community then takes an induced subgraph of it
+        self.tool_projector.build_full_weighted_graph(refresh=True)
         all_updates = []
         
-        for comm_id, members in communities.items():
-            logger.info(f"Processing Community {comm_id} ({len(members['tools'])} tools, {len(members['workflows'])} workflows)...")
-            
-            # 1. Tool Sub-Communities
-            tool_ids = members['tools']
-            if tool_ids:
-                # Use existing GraphProjector with filter
-                tool_graph = self.tool_projector.build_weighted_graph(filter_tool_ids=tool_ids)
-                tool_partition = self._run_leiden_on_graph(tool_graph, resolution=1.2) # Higher res for finer grain
+        # Sub-community partitions are independent, so run them across worker processes
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            jobs = [] # [(comm_id, type, future)]
+            for comm_id, members in communities.items():
+                logger.info(f"Processing Community {comm_id} ({len(members['tools'])} tools, {len(members['workflows'])} workflows)...")
                 
-                for tid, sub_id in tool_partition.items():
-                    all_updates.append({
-                        "type": "Tool",
-                        "id": tid,
-                        "comm_id": comm_id,
-                        "sub_id": f"{comm_id}_T_{sub_id}" # Unique SubCommunity ID
-                    })
+                # 1. Tool Sub-Communities
+                tool_ids = members['tools']
+                if tool_ids:
+                    # Use existing GraphProjector with filter (subgraph of the cached full graph)
+                    tool_graph = self.tool_projector.build_weighted_graph(filter_tool_ids=tool_ids)
+                    jobs.append((comm_id, "Tool", pool.submit(_leiden_partition, tool_graph, 1.2))) # Higher res for finer grain
 
-            # 2. Workflow Sub-Communities 
-            wf_ids = members['workflows']
-            if wf_ids:
-                # Create subgraph from Universal graph for just these workflows
-                wf_keys = [f"Workflow:{wid}" for wid in wf_ids]
-                wf_subgraph = univ_graph.subgraph(wf_keys)
-                wf_partition = self._run_leiden_on_graph(wf_subgraph, resolution=1.0)
-                
-                for key, sub_id in wf_partition.items():
-                    wid = key.split(":")[1]
-                    all_updates.append({
-                        "type": "Workflow",
-                        "id": wid,
-                        "comm_id": comm_id,
-                        "sub_id": f"{comm_id}_W_{sub_id}"
-                    })
+                # 2. Workflow Sub-Communities 
+                wf_ids = members['workflows']
+                if wf_ids:
+                    # Create subgraph from Universal graph for just these workflows
+                    wf_keys = [f"Workflow:{wid}" for wid in wf_ids]
+                    wf_subgraph = univ_graph.induced_subgraph(wf_keys)
+                    jobs.append((comm_id, "Workflow", pool.submit(_leiden_partition, wf_subgraph, 1.0)))
+
+            for comm_id, node_type, future in jobs:
+                partition = future.result()
+                if node_type == "Tool":
+                    for tid, sub_id in partition.items():
+                        all_updates.append({
+                            "type": "Tool",
+                            "id": tid,
+                            "comm_id": comm_id,
+                            "sub_id": f"{comm_id}_T_{sub_id}" # Unique SubCommunity ID
+                        })
+                else:
+                    for key, sub_id in partition.items():
+                        wid = key.split(":")[1]
+                        all_updates.append({
+                            "type": "Workflow",
+                            "id": wid,
+                            "comm_id": comm_id,
+                            "sub_id": f"{comm_id}_W_{sub_id}"
+                        })
 
         # Save to Neo4j 
         logger.info("Writing Hierarchical Communities to Neo4j...")
@@ -128,34 +152,47 @@ class HierarchicalLeiden:
         tools_batch = [r for r in all_updates if r['type'] == 'Tool']
         wf_batch = [r for r in all_updates if r['type'] == 'Workflow']
         
+        # Create each Community/SubCommunity pair once, so member rows only need MATCHes
+        hierarchy = [
+            {"comm_id": comm_id, "sub_id": sub_id}
+            for comm_id, sub_id in {(r['comm_id'], r['sub_id']) for r in all_updates}
+        ]
+        
+        query_hierarchy = """
+        UNWIND $batch AS row
+        MERGE (c:Community {id: row.comm_id})
+        MERGE (sub:SubCommunity {id: row.sub_id})
+        MERGE (sub)-[:BELONGS_TO]->(c)
+        """
+        
         query_tool = """
         UNWIND $batch AS row
         MATCH (t:Tool {id: row.id})
+        MATCH (c:Community {id: row.comm_id})
+        MATCH (sub:SubCommunity {id: row.sub_id})
         SET t.communityId = row.comm_id,
             t.subCommunityId = row.sub_id
-        MERGE (c:Community {id: row.comm_id})
-        MERGE (sub:SubCommunity {id: row.sub_id})
         MERGE (t)-[:IN_COMMUNITY]->(c)
         MERGE (t)-[:IN_SUBCOMMUNITY]->(sub)
-        MERGE (sub)-[:BELONGS_TO]->(c)
         """
         
         query_wf = """
         UNWIND $batch AS row
         MATCH (w:Workflow {id: row.id})
+        MATCH (c:Community {id: row.comm_id})
+        MATCH (sub:SubCommunity {id: row.sub_id})
         SET w.communityId = row.comm_id,
             w.subCommunityId = row.sub_id
-        MERGE (c:Community {id: row.comm_id})
-        MERGE (sub:SubCommunity {id: row.sub_id})
         MERGE (w)-[:IN_COMMUNITY]->(c)
         MERGE (w)-[:IN_SUBCOMMUNITY]->(sub)
-        MERGE (sub)-[:BELONGS_TO]->(c)
         """
 
+        if hierarchy:
+            self.neo4j.execute_batch(query_hierarchy, hierarchy, batch_size=WRITE_BATCH_SIZE)
         if tools_batch:
-            self.neo4j.execute_batch(query_tool, tools_batch)
+            self.neo4j.execute_batch(query_tool, tools_batch, batch_size=WRITE_BATCH_SIZE)
         if wf_batch:
-            self.neo4j.execute_batch(query_wf, wf_batch)
+            self.neo4j.execute_batch(query_wf, wf_batch, batch_size=WRITE_BATCH_SIZE)
             
         logger.info("Hierarchical detection complete.")
 
@@ -1,11 +1,23 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
 from src.graph_db.neo4j_manager import Neo4jManager
+from src.utils.embeddings import EmbeddingService
 from config import settings
 from src.utils.logger import get_logger
 import time
 
 logger = get_logger("community_summarizer")
 
+# Concurrent Gemini requests; the calls are I/O-bound, so threads overlap their round trips
+SUMMARY_MAX_WORKERS = 8
+# Minimum spacing between Gemini request starts across all workers, and retries on rate limiting (429)
+SUMMARY_MIN_INTERVAL = 1.0
+SUMMARY_MAX_RETRIES = 4
+# Communities smaller than this are described from their members instead of calling the LLM
+MIN_MEMBERS_FOR_LLM = 3
+
 class CommunitySummarizer:
     """
     Generates summaries for the Hierarchical Community Structure.
@@ -13,12 +25,36 @@ class CommunitySummarizer:
     2. Summarizes Level 2 SubCommunities based on their specific members.
     """
     def __init__(self):
-        self.neo4j = Neo4jManager()
+        self.neo4j = Neo4jManager.instance()
         if not settings.GEMINI_API_KEY:
             raise ValueError("GEMINI_API_KEY is not set.")
         genai.configure(api_key=settings.GEMINI_API_KEY)
         # Using flash for speed and to avoid rate limits
         self.model = genai.GenerativeModel('gemini-2.5-flash')
+        self.embedder = EmbeddingService()
+        self._rate_lock = threading.Lock()
+        self._next_request_at = 0.0
+        self.ensure_indexes()
+
+    def ensure_indexes(self):
+        """Idempotently creates the constraints/indexes the community lookups and write-backs seek on."""
+        self.neo4j.create_constraints([
+            "CREATE CONSTRAINT IF NOT EXISTS FOR (t:Tool) REQUIRE t.id IS UNIQUE",
+            "CREATE CONSTRAINT IF NOT EXISTS FOR (w:Workflow) REQUIRE w.id IS UNIQUE",
+            "CREATE CONSTRAINT IF NOT EXISTS FOR (c:Community) REQUIRE c.id IS UNIQUE",
+            "CREATE CONSTRAINT IF NOT EXISTS FOR (sub:SubCommunity) REQUIRE sub.id IS UNIQUE",
+            "CREATE INDEX tool_communityId IF NOT EXISTS FOR (t:Tool) ON (t.communityId)",
+            # Lets GlobalSearch pre-rank communities by summary embedding before calling the LLM
+            """
+            CREATE VECTOR INDEX community_embeddings IF NOT EXISTS
+            FOR (c:Community)
+            ON (c.embedding)
+            OPTIONS {indexConfig: {
+             `vector.dimensions`: 384,
+             `vector.similarity_function`: 'cosine'
+            }}
+            """,
+        ])
 
     def fetch_communities(self):
         """Fetch Level 1 Communities and their members."""
@@ -44,7 +80,20 @@ class CommunitySummarizer:
         """
         return self.neo4j.execute_query(query)
 
+    def _throttle(self):
+        """Spaces request starts at least SUMMARY_MIN_INTERVAL apart across all threads."""
+        with self._rate_lock:
+            now = time.monotonic()
+            wait = self._next_request_at - now
+            self._next_request_at = max(now, self._next_request_at) + SUMMARY_MIN_INTERVAL
+        if wait > 0:
+            time.sleep(wait)
+
     def generate_summary(self, members_list, level="Community"):
+        """
+        Returns (title, summary), or None if Gemini could not produce one
+        (rate-limited past SUMMARY_MAX_RETRIES, or another API error).
+        """
         if not members_list:
             return "Empty Community", "No members found."
 
@@ -67,47 +116,101 @@ class CommunitySummarizer:
         Summary: <Summary>
         """
         
-        try:
-            response = self.model.generate_content(prompt)
-            text = response.text.strip()
-            
-            title = "Unknown"
-            summary = "No summary generated."
+        for attempt in range(SUMMARY_MAX_RETRIES + 1):
+            self._throttle()
+            try:
+                response = self.model.generate_content(prompt)
+                text = response.text.strip()
+                break
+            except google_exceptions.ResourceExhausted as e:
+                if attempt == SUMMARY_MAX_RETRIES:
+                    logger.error(f"Rate limited, giving up on summary: {e}")
+                    return None
+                backoff = 2 ** (attempt + 1)
+                logger.warning(f"Rate limited, retrying in {backoff}s: {e}")
+                time.sleep(backoff)
+            except Exception as e:
+                logger.error(f"Error generating summary: {e}")
+                return None
             
-            for line in text.split('\n'):
-                if line.startswith("Title:"):
-                    title = line.replace("Title:", "").strip()
-                elif line.startswith("Summary:"):
-                    summary = line.replace("Summary:", "").strip()
-            
-            return title, summary
-        except Exception as e:
-            logger.error(f"Error generating summary: {e}")
-            time.sleep(2) # Backoff
-            return "Error", "Could not generate summary."
+        title = "Unknown"
+        summary = "No summary generated."
+        
+        for line in text.split('\n'):
+            if line.startswith("Title:"):
+                title = line.replace("Title:", "").strip()
+            elif line.startswith("Summary:"):
+                summary = line.replace("Summary:", "").strip()
+        
+        return title, summary
+
+    @staticmethod
+    def trivial_summary(members_list):
+        """
+        Title/summary for a community too small to be worth an LLM call.
+        Members are formatted "<Label>: <name> - <description>".
+        """
+        if not members_list:
+            return "Empty Community", "No members found."
+
+        names = []
+        for member in members_list:
+            name = member.split(": ", 1)[-1].split(" - ", 1)[0].strip()
+            names.append(name or member)
+        return " / ".join(names), " ".join(members_list)
+
+    def summarize_all(self, records, level, label):
+        """
+        Summarizes each record's members with up to SUMMARY_MAX_WORKERS requests in flight.
+        Records whose summary failed are left out, so they keep their previous
+        name/summary and are picked up again on a later run.
+        Returns:
+            list: [{"id", "title", "summary"}] in the same order as `records`
+        """
+        def summarize(rec):
+            if len(rec['members']) < MIN_MEMBERS_FOR_LLM:
+                title, summary = self.trivial_summary(rec['members'])
+                return {"id": rec['id'], "title": title, "summary": summary}
+
+            logger.info(f"Summarizing {label} {rec['id']} ({len(rec['members'])} members)...")
+            result = self.generate_summary(rec['members'], level=level)
+            if result is None:
+                return None
+            title, summary = result
+            logger.info(f" -> {rec['id']}: {title}")
+            return {"id": rec['id'], "title": title, "summary": summary}
+
+        with ThreadPoolExecutor(max_workers=SUMMARY_MAX_WORKERS) as pool:
+            updates = list(pool.map(summarize, records))
+
+        failed = sum(1 for row in updates if row is None)
+        if failed:
+            logger.warning(f"Skipped {failed} {label} summaries that failed; rerun to fill them in.")
+        return [row for row in updates if row is not None]
 
     def run_summarization(self):
         # 1. Summarize Level 1 Communities
         communities = self.fetch_communities()
         logger.info(f"Summarizing {len(communities)} Level 1 Communities...")
         
-        comm_updates = []
-        for rec in communities:
-            cid = rec['id']
-            members = rec['members']
-            logger.info(f"Summarizing Community {cid} ({len(members)} members)...")
-            
-            title, summary = self.generate_summary(members, level="High-Level Topic")
-            logger.info(f" -> {title}")
-            
-            comm_updates.append({"id": cid, "title": title, "summary": summary})
-            time.sleep(1)
+        comm_updates = self.summarize_all(communities, "High-Level Topic", "Community")
+
+        # Embed each community's title + summary for the GlobalSearch vector pre-filter
+        texts = [f"{row['title']}. {row['summary']}" for row in comm_updates]
+        for row, embedding in zip(comm_updates, self.embedder.generate_embeddings_batch(texts)):
+            row['embedding'] = embedding
+
+        missing = sum(1 for row in comm_updates if len(row.get('embedding') or []) != 384)
+        if missing:
+            logger.warning(f"{missing} communities have no summary embedding; GlobalSearch always includes them.")
 
         if comm_updates:
+            # A failed embedding ([]) clears the property rather than storing an invalid vector
             query = """
             UNWIND $batch AS row
             MATCH (c:Community {id: row.id})
-            SET c.name = row.title, c.summary = row.summary
+            SET c.name = row.title, c.summary = row.summary,
+                c.embedding = CASE WHEN size(row.embedding) = 384 THEN row.embedding ELSE null END
             """
             self.neo4j.execute_batch(query, comm_updates)
 
@@ -115,17 +218,7 @@ class CommunitySummarizer:
         subcommunities = self.fetch_subcommunities()
         logger.info(f"Summarizing {len(subcommunities)} Level 2 SubCommunities...")
         
-        sub_updates = []
-        for rec in subcommunities:
-            sid = rec['id']
-            members = rec['members']
-            logger.info(f"Summarizing SubCommunity {sid} ({len(members)} members)...")
-            
-            title, summary = self.generate_summary(members, level="Functional Sub-Group")
-            logger.info(f" -> {title}")
-            
-            sub_updates.append({"id": sid, "title": title, "summary": summary})
-            time.sleep(1)
+        sub_updates = self.summarize_all(subcommunities, "Functional Sub-Group", "SubCommunity")
 
         if sub_updates:
             query = """
@@ -1,11 +1,13 @@
-import networkx as nx
+import igraph as ig
 import numpy as np
 from src.graph_db.neo4j_manager import Neo4jManager
 from src.utils.logger import get_logger
-from sklearn.metrics.pairwise import cosine_similarity
+from src.utils.similarity import normalize_rows, similar_pairs
 
 logger = get_logger("universal_projector")
 
+EMBEDDING_DIM = 384
+
 class UniversalGraphProjector:
     """
     Level 1: Universal Semantic Layer.
@@ -13,86 +15,76 @@ class UniversalGraphProjector:
     Edges are purely based on Cosine Similarity of embeddings.
     """
     def __init__(self):
-        self.neo4j = Neo4jManager()
+        self.neo4j = Neo4jManager.instance()
 
     def fetch_all_embeddings(self):
         """
         Fetches embeddings for both Tools and Workflows.
         Returns:
-            dict: {node_key: embedding_array}
+            list: node keys, one per matrix row
+            np.ndarray: unit-normalized float32 matrix of shape (len(keys), EMBEDDING_DIM)
             dict: {node_key: node_type} ('Tool' or 'Workflow')
         
         Node Keys are prefixed: "Tool:<id>" or "Workflow:<id>"
         """
         logger.info("Fetching Universal Embeddings (Tools + Workflows)...")
         
-        embeddings = {}
+        # Fetch Tools and Workflows in one round trip; `type` is the node's label
+        query = """
+        MATCH (n) WHERE (n:Tool OR n:Workflow) AND n.embedding IS NOT NULL
+        RETURN CASE WHEN n:Tool THEN 'Tool' ELSE 'Workflow' END AS type, n.id AS id, n.embedding AS embedding
+        """
+        results = self.neo4j.execute_query(query)
+        
+        # Fill a preallocated float32 buffer directly, skipping rows with the wrong dimension
+        keys = []
         node_types = {}
+        matrix = np.empty((len(results), EMBEDDING_DIM), dtype=np.float32)
         
-        # Fetch Tools
-        query_tools = "MATCH (t:Tool) WHERE t.embedding IS NOT NULL RETURN t.id AS id, t.embedding AS embedding"
-        results_tools = self.neo4j.execute_query(query_tools)
-        for r in results_tools:
+        for r in results:
             # Use prefix to distinguish types and ensure uniqueness
-            key = f"Tool:{r['id']}"
-            embeddings[key] = np.array(r['embedding'])
-            node_types[key] = "Tool"
-            
-        # Fetch Workflows
-        query_workflows = "MATCH (w:Workflow) WHERE w.embedding IS NOT NULL RETURN w.id AS id, w.embedding AS embedding"
-        results_workflows = self.neo4j.execute_query(query_workflows)
-        for r in results_workflows:
-            key = f"Workflow:{r['id']}"
-            embeddings[key] = np.array(r['embedding'])
-            node_types[key] = "Workflow"
-            
-        logger.info(f"Fetched {len(embeddings)} entities ({len(results_tools)} Tools, {len(results_workflows)} Workflows).")
-        return embeddings, node_types
+            key = f"{r['type']}:{r['id']}"
+            node_types[key] = r['type']
+            emb = r['embedding']
+            if len(emb) != EMBEDDING_DIM:
+                logger.warning(f"Skipping {key}: Dimension {len(emb)} != {EMBEDDING_DIM}")
+                continue
+            matrix[len(keys)] = emb
+            keys.append(key)
+        
+        n_tools = sum(1 for t in node_types.values() if t == "Tool")
+        logger.info(f"Fetched {len(node_types)} entities ({n_tools} Tools, {len(node_types) - n_tools} Workflows).")
+        # Unit-normalize once at load so similarity is a plain matmul
+        return keys, normalize_rows(matrix[:len(keys)]), node_types
 
     def build_universal_graph(self, similarity_threshold=0.7):
         """
         Builds the universal semantic graph.
+        Returns an igraph graph whose vertex 'name' is the node key and 'type' its node type.
         """
-        G = nx.Graph()
-        
-        embeddings, node_types = self.fetch_all_embeddings()
-        
-        # Filter for dimension consistency (384)
-        valid_keys = []
-        valid_vectors = []
-        expected_dim = 384
-        
-        for key, emb in embeddings.items():
-            if len(emb) == expected_dim:
-                valid_keys.append(key)
-                valid_vectors.append(emb)
-            else:
-                logger.warning(f"Skipping {key}: Dimension {len(emb)} != {expected_dim}")
+        valid_keys, matrix, node_types = self.fetch_all_embeddings()
         
         if not valid_keys:
             logger.error("No valid embeddings found.")
-            return G, node_types
+            return ig.Graph(), node_types
 
-        # Add nodes with type info
-        for key in valid_keys:
-            G.add_node(key, type=node_types[key])
-            
         # Calculate Similarity
         logger.info("Calculating Universal Cosine Similarity...")
-        matrix = np.array(valid_vectors)
-        sim_matrix = cosine_similarity(matrix)
-        
-        # Find pairs with high similarity
-        rows, cols = np.where(sim_matrix > similarity_threshold)
         
-        edge_count = 0
-        for r, c in zip(rows, cols):
-            if r < c: # Upper triangle
-                weight = sim_matrix[r, c]
-                G.add_edge(valid_keys[r], valid_keys[c], weight=weight)
-                edge_count += 1
+        # Find pairs with high similarity (upper triangle only, r < c) tile by tile,
+        # without materializing the N x N similarity matrix
+        rows, cols, weights = similar_pairs(matrix, similarity_threshold)
+                
+        # Add nodes with type info
+        G = ig.Graph(
+            n=len(valid_keys),
+            edges=np.column_stack((rows, cols)).tolist(),
+            directed=False,
+            vertex_attrs={'name': valid_keys, 'type': [node_types[key] for key in valid_keys]},
+            edge_attrs={'weight': weights.tolist()}
+        )
                 
-        logger.info(f"Built Universal Graph: {G.number_of_nodes()} nodes, {edge_count} edges.")
+        logger.info(f"Built Universal Graph: {G.vcount()} nodes, {G.ecount()} edges.")
         return G, node_types
 
     def close(self):
@@ -1,24 +1,45 @@
 import os
-import json
+import hashlib
 import re
+import threading
 import time
-import xml.etree.ElementTree as ET
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
 from bioblend.galaxy import GalaxyInstance
 from dotenv import load_dotenv
-from jsonschema import validate, ValidationError
+from jsonschema import Draft202012Validator
+from lxml import etree
 from tqdm import tqdm
 
-from config.settings import GITHUB_TOKEN, GALAXY_URL, GALAXY_API_KEY
+from config.settings import GITHUB_TOKEN, GALAXY_URL, GALAXY_API_KEY, DATA_CACHE_DIR
 from src.utils.logger import get_logger
 
 logger = get_logger("galaxy_data_extractor")
 
 GITHUB_HEADERS = {"Authorization": f"token {GITHUB_TOKEN}"} if GITHUB_TOKEN else {}
 
+HTTP_POOL_SIZE = 32
+
+
+def make_session(headers: dict | None = None) -> requests.Session:
+    """Keep-alive session with a connection pool sized for the fetch threads (retries stay in our helpers)."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=0)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    if headers:
+        session.headers.update(headers)
+    return session
+
+
+# One pooled session per host family, so TLS handshakes are amortized across requests
+GALAXY_SESSION = make_session()
+GITHUB_SESSION = make_session(GITHUB_HEADERS)
+
 GALAXY_URL = GALAXY_URL
 GALAXY_API_KEY = GALAXY_API_KEY
 
@@ -27,11 +48,19 @@ if not GALAXY_API_KEY:
 
 OUTPUT_FILE = "data/tools.json"
 MAX_TOOLS = 500
+# Concurrent Galaxy/GitHub fetches; kept below HTTP_POOL_SIZE so every worker gets a pooled connection
+FETCH_WORKERS = 24
 MAX_RETRIES = 5
 BASE_DELAY = 1.0
 
+# On-disk response cache for re-runs; entries older than CACHE_TTL seconds are refetched
+CACHE_TTL = 24 * 60 * 60
+
 # IWC GitHub constants
 GITHUB_API_URL = "https://api.github.com/repos/galaxyproject/iwc/contents/workflows"
+GITHUB_TREE_URL = "https://api.github.com/repos/galaxyproject/iwc/git/trees/main?recursive=1"
+# workflows/<category>/<repo>/<file>.ga, directly inside the repo directory
+IWC_GA_PATH = re.compile(r"^workflows/([^/]+)/([^/]+)/[^/]+\.ga$", re.IGNORECASE)
 GITHUB_RAW_BASE = "https://raw.githubusercontent.com/galaxyproject/iwc/main"
 OUTPUT_WORKFLOWS_FILE = "data/iwc_workflows.json"
 OUTPUT_WORKFLOW_STEPS_FILE = "data/iwc_workflow_steps.json"
@@ -92,14 +121,29 @@ WORKFLOW_STEP_NODE_SCHEMA = {
     },
 }
 
+# Validators are built once; jsonschema.validate() re-checks and recompiles the schema per call
+TOOL_VALIDATOR = Draft202012Validator(TOOL_SCHEMA)
+WORKFLOW_NODE_VALIDATOR = Draft202012Validator(WORKFLOW_NODE_SCHEMA)
+WORKFLOW_STEP_NODE_VALIDATOR = Draft202012Validator(WORKFLOW_STEP_NODE_SCHEMA)
+
+
+# Tool XML parser: like xml.etree, drop comments/PIs so element .text is uninterrupted,
+# and never expand entities from downloaded sources
+TOOL_XML_PARSER = etree.XMLParser(remove_comments=True, remove_pis=True, resolve_entities=False)
+
+# Help text cleanup patterns, compiled once at import
+HTML_TAG_RE = re.compile(r"<[^>]+>")
+RULE_RE = re.compile(r"[=_]{2,}")
+WHITESPACE_RE = re.compile(r"\s+")
+
 
 def clean_help_text(text: str) -> str:
     """Removes HTML, markdown, and artifacts from help text."""
     if not isinstance(text, str):
         return ""
-    text = re.sub(r"<[^>]+>", " ", text)
-    text = re.sub(r"[=_]{2,}", " ", text)
-    text = re.sub(r"\s+", " ", text)
+    text = HTML_TAG_RE.sub(" ", text)
+    text = RULE_RE.sub(" ", text)
+    text = WHITESPACE_RE.sub(" ", text)
     return text.strip()
 
 
@@ -112,10 +156,11 @@ def normalize_tool_id(tool_id: str) -> str:
 
 
 # extract input/output formats 
-def extract_formats(root: ET.Element) -> tuple[list, list]:
+def extract_formats(root: etree._Element) -> tuple[list, list]:
     """Extract ONLY input formats + output formats."""
-    input_formats = []
-    output_formats = []
+    # dict keys act as an insertion-ordered set
+    input_formats: dict[str, None] = {}
+    output_formats: dict[str, None] = {}
 
     # INPUTS
     inputs = root.find("inputs")
@@ -125,8 +170,8 @@ def extract_formats(root: ET.Element) -> tuple[list, list]:
             if fmt:
                 for f in fmt.split(","):
                     f = f.strip()
-                    if f and f not in input_formats:
-                        input_formats.append(f)
+                    if f:
+                        input_formats[f] = None
 
     # OUTPUTS
     outputs = root.find("outputs")
@@ -136,17 +181,17 @@ def extract_formats(root: ET.Element) -> tuple[list, list]:
             if fmt:
                 for f in fmt.split(","):
                     f = f.strip()
-                    if f and f not in output_formats:
-                        output_formats.append(f)
+                    if f:
+                        output_formats[f] = None
 
-    return input_formats, output_formats
+    return list(input_formats), list(output_formats)
 
 
 def get_with_retry(url: str, params: dict) -> requests.Response | None:
     """GET with retry & backoff for 429 / transient HTTP errors."""
     for attempt in range(MAX_RETRIES):
         try:
-            resp = requests.get(url, params=params, timeout=30)
+            resp = GALAXY_SESSION.get(url, params=params, timeout=30)
         except requests.RequestException as e:
             if attempt == MAX_RETRIES - 1:
                 logger.info(f"Request failed (final): {e}")
@@ -175,14 +220,103 @@ def get_with_retry(url: str, params: dict) -> requests.Response | None:
     return None
 
 
+def cache_path(namespace: str, key: str) -> str:
+    """Path of the cache entry for `key` (hashed, so any URL or tool ID is a safe filename)."""
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+    return os.path.join(DATA_CACHE_DIR, namespace, digest)
+
+
+def read_cache(namespace: str, key: str, ttl: float | None = CACHE_TTL) -> bytes | None:
+    """Return the cached bytes for `key`, or None if missing or older than `ttl` (None: never expires)."""
+    path = cache_path(namespace, key)
+    try:
+        if ttl is not None and time.time() - os.path.getmtime(path) > ttl:
+            return None
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def write_cache(namespace: str, key: str, data: bytes) -> None:
+    path = cache_path(namespace, key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so a concurrent reader never sees a partial entry
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.info(f"Could not write cache entry for {key}: {e}")
+
+
+def fetch_raw_tool_source(tool_id: str) -> bytes | None:
+    """Raw tool XML from Galaxy, served from the on-disk cache when fresh."""
+    # Keyed on the full URL so switching GALAXY_URL never serves another server's XML
+    raw_tool_url = f"{GALAXY_URL}/api/tools/{tool_id}/raw_tool_source"
+    cached = read_cache("galaxy_tools", raw_tool_url)
+    if cached is not None:
+        return cached
+
+    resp = get_with_retry(raw_tool_url, params={"key": GALAXY_API_KEY})
+    if resp is None:
+        return None
+    write_cache("galaxy_tools", raw_tool_url, resp.content)
+    return resp.content
+
+
 # --- GitHub helpers (IWC workflows) ---
 
 
-def github_get_with_retry(url: str) -> requests.Response | None:
-    """GET against GitHub API with retry/backoff for 429/403/5xx."""
+GITHUB_ETAGS_FILE = os.path.join(DATA_CACHE_DIR, "github_etags.json")
+_github_etags: dict[str, str] | None = None
+_github_etags_lock = threading.Lock()
+
+
+def github_etag(url: str) -> str | None:
+    global _github_etags
+    with _github_etags_lock:
+        if _github_etags is None:
+            try:
+                with open(GITHUB_ETAGS_FILE, "rb") as f:
+                    _github_etags = orjson.loads(f.read())
+            except (OSError, orjson.JSONDecodeError):
+                _github_etags = {}
+        return _github_etags.get(url)
+
+
+def set_github_etag(url: str, etag: str) -> None:
+    github_etag(url)  # make sure the sidecar is loaded
+    with _github_etags_lock:
+        _github_etags[url] = etag
+
+
+def save_github_etags() -> None:
+    """Persist the URL -> ETag sidecar used for conditional GitHub API requests."""
+    with _github_etags_lock:
+        if not _github_etags:
+            return
+        try:
+            os.makedirs(os.path.dirname(GITHUB_ETAGS_FILE), exist_ok=True)
+            with open(GITHUB_ETAGS_FILE, "wb") as f:
+                f.write(orjson.dumps(_github_etags))
+        except OSError as e:
+            logger.info(f"Could not write GitHub ETags: {e}")
+
+
+def github_get_with_retry(url: str) -> bytes | None:
+    """
+    GET against GitHub API with retry/backoff for 429/403/5xx; returns the response body.
+    Sends If-None-Match with the last ETag seen for `url`, and on 304 Not Modified
+    (which does not count against the rate limit) returns the cached body instead.
+    """
+    cached = read_cache("github_api", url, ttl=None)
+    etag = github_etag(url) if cached is not None else None
+    headers = {"If-None-Match": etag} if etag else None
     for attempt in range(MAX_RETRIES):
         try:
-            resp = requests.get(url, headers=GITHUB_HEADERS, timeout=30)
+            resp = GITHUB_SESSION.get(url, headers=headers, timeout=30)
         except requests.RequestException as e:
             if attempt == MAX_RETRIES - 1:
                 logger.info(f"GitHub request failed (final): {e}")
@@ -207,8 +341,14 @@ def github_get_with_retry(url: str) -> requests.Response | None:
             time.sleep(delay)
             continue
 
+        if resp.status_code == 304:
+            return cached
+
         if resp.ok:
-            return resp
+            if resp.headers.get("ETag"):
+                write_cache("github_api", url, resp.content)
+                set_github_etag(url, resp.headers["ETag"])
+            return resp.content
 
         if 500 <= resp.status_code < 600:
             if attempt < MAX_RETRIES - 1:
@@ -221,7 +361,7 @@ def github_get_with_retry(url: str) -> requests.Response | None:
 
 
 def github_fetch_text(path_or_url: str) -> str | None:
-    """Fetch text from a raw URL or repo-relative path under IWC main."""
+    """Fetch text from a raw URL or repo-relative path under IWC main (cached on disk for CACHE_TTL)."""
     if not isinstance(path_or_url, str):
         return None
     url = (
@@ -229,16 +369,21 @@ def github_fetch_text(path_or_url: str) -> str | None:
         if path_or_url.startswith("http")
         else f"{GITHUB_RAW_BASE}/{path_or_url.lstrip('/')}"
     )
+    cached = read_cache("github_raw", url)
+    if cached is not None:
+        return cached.decode("utf-8", errors="replace")
+
     for attempt in range(MAX_RETRIES):
         try:
-            resp = requests.get(url, headers=GITHUB_HEADERS, timeout=30)
+            resp = GITHUB_SESSION.get(url, timeout=30)
             if resp.status_code in (429, 403):
                 retry_after = resp.headers.get("Retry-After")
                 delay = float(retry_after) if retry_after else BASE_DELAY * (2**attempt)
                 time.sleep(delay)
                 continue
             if resp.ok:
-                return resp.text
+                write_cache("github_raw", url, resp.content)
+                return resp.content.decode("utf-8", errors="replace")
             if 500 <= resp.status_code < 600:
                 time.sleep(BASE_DELAY * (2**attempt))
                 continue
@@ -255,11 +400,11 @@ def github_fetch_text(path_or_url: str) -> str | None:
 def parse_ga_steps(ga_text: str) -> tuple[str, list[dict]]:
     """Return (workflow_name, steps_list_from_ga)."""
     try:
-        data = json.loads(ga_text)
+        data = orjson.loads(ga_text)
         name = data.get("name") or ""
         steps = list((data.get("steps") or {}).items())  # [(key, step_dict), ...]
         return name, steps
-    except json.JSONDecodeError:
+    except orjson.JSONDecodeError:
         return "", []
 
 
@@ -273,25 +418,29 @@ def process_iwc_repo(category: str, repo: dict) -> tuple[dict | None, list[dict]
     if not repo_name:
         return None, []
 
-    # Get files inside this repo directory
-    contents_resp = github_get_with_retry(repo.get("url"))
-    if not contents_resp:
-        return None, []
-    contents = contents_resp.json()
-
-    # Find first .ga file
-    ga_item = next(
-        (
-            i
-            for i in contents
-            if i.get("type") == "file" and i.get("name", "").lower().endswith(".ga")
-        ),
-        None,
-    )
-    if not ga_item:
-        return None, []
+    # Repos listed from the Git tree already know their .ga path
+    ga_source = repo.get("ga_path")
+    if not ga_source:
+        # Get files inside this repo directory
+        contents_body = github_get_with_retry(repo.get("url"))
+        if not contents_body:
+            return None, []
+        contents = orjson.loads(contents_body)
+
+        # Find first .ga file
+        ga_item = next(
+            (
+                i
+                for i in contents
+                if i.get("type") == "file" and i.get("name", "").lower().endswith(".ga")
+            ),
+            None,
+        )
+        if not ga_item:
+            return None, []
+
+        ga_source = ga_item.get("download_url") or ga_item.get("path")
 
-    ga_source = ga_item.get("download_url") or ga_item.get("path")
     ga_text = github_fetch_text(ga_source)
     if not ga_text:
         return None, []
@@ -331,34 +480,95 @@ def process_iwc_repo(category: str, repo: dict) -> tuple[dict | None, list[dict]
     return workflow_node, step_nodes
 
 
+def list_iwc_repos_from_tree() -> dict[str, list[dict]] | None:
+    """
+    List every IWC workflow repo with its first .ga file from one recursive Git tree call.
+    Returns {category: [{"name": repo, "ga_path": path}]} in path order,
+    or None if the tree is unavailable or truncated.
+    """
+    tree_body = github_get_with_retry(GITHUB_TREE_URL)
+    if not tree_body:
+        return None
+    tree = orjson.loads(tree_body)
+    if tree.get("truncated"):
+        logger.info("IWC Git tree is truncated; falling back to the contents API.")
+        return None
+
+    repos_by_category: dict[str, list[dict]] = {}
+    seen = set()
+    for item in sorted(tree.get("tree", []), key=lambda i: i.get("path", "")):
+        match = IWC_GA_PATH.match(item.get("path", ""))
+        if item.get("type") != "blob" or not match:
+            continue
+        category, repo_name = match.groups()
+        if (category, repo_name) in seen:
+            continue  # keep the first .ga file, as the contents listing did
+        seen.add((category, repo_name))
+        repos_by_category.setdefault(category, []).append(
+            {"name": repo_name, "ga_path": item["path"]}
+        )
+    return repos_by_category
+
+
+def iter_iwc_repos(should_stop=lambda: False):
+    """
+    Yield (category, repos) pairs, from the Git tree when possible, else via the contents API.
+    `should_stop` is checked before each category listing request, so no listing is
+    fetched once the caller's cap has been reached.
+    """
+    repos_by_category = list_iwc_repos_from_tree()
+    if repos_by_category is not None:
+        yield from repos_by_category.items()
+        return
+
+    # List top-level workflow categories
+    cats_body = github_get_with_retry(GITHUB_API_URL)
+    if not cats_body:
+        logger.info("Failed to list IWC workflow categories.")
+        return
+    for cat in orjson.loads(cats_body):
+        if cat.get("type") != "dir":
+            continue
+        if should_stop():
+            return
+        # List repos inside category
+        repos_body = github_get_with_retry(cat.get("url"))
+        if not repos_body:
+            continue
+        yield cat.get("name", ""), [r for r in orjson.loads(repos_body) if r.get("type") == "dir"]
+
+
 def validate_workflow_nodes(data: list[dict]) -> bool:
-    try:
-        validate(instance=data, schema=WORKFLOW_NODE_SCHEMA)
-        return True
-    except ValidationError as e:
-        logger.info(f"Workflow node validation failed: {e.message}")
+    error = next(WORKFLOW_NODE_VALIDATOR.iter_errors(data), None)
+    if error is not None:
+        logger.info(f"Workflow node validation failed: {error.message}")
         return False
+    return True
 
 
 def validate_workflow_step_nodes(data: list[dict]) -> bool:
-    try:
-        validate(instance=data, schema=WORKFLOW_STEP_NODE_SCHEMA)
-        return True
-    except ValidationError as e:
-        logger.info(f"WorkflowStep node validation failed: {e.message}")
+    error = next(WORKFLOW_STEP_NODE_VALIDATOR.iter_errors(data), None)
+    if error is not None:
+        logger.info(f"WorkflowStep node validation failed: {error.message}")
         return False
+    return True
 
 
 def validate_data(data: list[dict]) -> bool:
     logger.info("Validating final data...")
-    try:
-        validate(instance=data, schema=TOOL_SCHEMA)
-        logger.info("Validation successful!")
-        return True
-    except ValidationError as e:
-        logger.info(f"Validation FAILED: {e.message}")
+    error = next(TOOL_VALIDATOR.iter_errors(data), None)
+    if error is not None:
+        logger.info(f"Validation FAILED: {error.message}")
         return False
+    logger.info("Validation successful!")
+    return True
+
+
 
+def write_json(path: str, data: list[dict]) -> None:
+    """Write `data` as indented UTF-8 JSON using orjson's native encoder."""
+    with open(path, "wb") as f:
+        f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
 
 
 def main():
@@ -379,11 +589,14 @@ def main():
     tools_subset = all_tools[:MAX_TOOLS]
     logger.info(f"Processing first {len(tools_subset)} tools (cap={MAX_TOOLS}).")
 
+    # Each tool is an independent, I/O-bound request; overlap them across worker threads
     processed_tools = []
-    for tool in tqdm(tools_subset, desc="Processing tools", unit="tool"):
-        result = fetch_and_process_tool(tool, gi)
-        if result:
-            processed_tools.append(result)
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+        results = pool.map(lambda tool: fetch_and_process_tool(tool, gi), tools_subset)
+        # map() yields in input order, so tools.json keeps the Galaxy listing order
+        for result in tqdm(results, total=len(tools_subset), desc="Processing tools", unit="tool"):
+            if result:
+                processed_tools.append(result)
 
     if not processed_tools:
         logger.info("No tools processed. Exiting.")
@@ -399,8 +612,7 @@ def main():
     if out_dir:
         os.makedirs(out_dir, exist_ok=True)
 
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-        json.dump(processed_tools, f, indent=2, ensure_ascii=False)
+    write_json(OUTPUT_FILE, processed_tools)
 
     duration = datetime.now() - start_time
     logger.info(f"Pipeline completed in {duration}")
@@ -412,33 +624,24 @@ def main():
     workflow_steps: list[dict] = []
     processed = 0
 
-    # List top-level workflow categories
-    cats_resp = github_get_with_retry(GITHUB_API_URL)
-    if not cats_resp:
-        logger.info("Failed to list IWC workflow categories.")
-        return
-    categories = [c for c in cats_resp.json() if c.get("type") == "dir"]
-
-    for cat in tqdm(categories, desc="IWC categories", unit="cat"):
-        if processed >= MAX_WORKFLOWS:
-            break
-        # List repos inside category
-        repos_resp = github_get_with_retry(cat.get("url"))
-        if not repos_resp:
-            continue
-        repos = [r for r in repos_resp.json() if r.get("type") == "dir"]
-        for repo in tqdm(
-            repos, desc=f"{cat.get('name','category')}", leave=False, unit="repo"
-        ):
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+        for category, repos in tqdm(iter_iwc_repos(lambda: processed >= MAX_WORKFLOWS), desc="IWC categories", unit="cat"):
             if processed >= MAX_WORKFLOWS:
                 break
-            wf_node, steps_nodes = process_iwc_repo(cat.get("name", ""), repo)
-            if wf_node:
-                workflows.append(wf_node)
-                workflow_steps.extend(steps_nodes)
-                processed += 1
+
+            # Fetch repos concurrently, but only as many as are still needed to reach the cap
+            while repos and processed < MAX_WORKFLOWS:
+                batch, repos = repos[: MAX_WORKFLOWS - processed], repos[MAX_WORKFLOWS - processed :]
+                for wf_node, steps_nodes in pool.map(
+                    lambda repo: process_iwc_repo(category, repo), batch
+                ):
+                    if wf_node:
+                        workflows.append(wf_node)
+                        workflow_steps.extend(steps_nodes)
+                        processed += 1
 
     logger.info(f"IWC workflows processed: {len(workflows)}")
+    save_github_etags()
 
     if not workflows:
         logger.info("No IWC workflows processed. Exiting.")
@@ -451,10 +654,8 @@ def main():
         return
 
     os.makedirs(os.path.dirname(OUTPUT_WORKFLOWS_FILE), exist_ok=True)
-    with open(OUTPUT_WORKFLOWS_FILE, "w", encoding="utf-8") as f:
-        json.dump(workflows, f, indent=2, ensure_ascii=False)
-    with open(OUTPUT_WORKFLOW_STEPS_FILE, "w", encoding="utf-8") as f:
-        json.dump(workflow_steps, f, indent=2, ensure_ascii=False)
+    write_json(OUTPUT_WORKFLOWS_FILE, workflows)
+    write_json(OUTPUT_WORKFLOW_STEPS_FILE, workflow_steps)
 
     logger.info(f"Wrote workflows to: {OUTPUT_WORKFLOWS_FILE}")
     logger.info(f"Wrote workflow steps to: {OUTPUT_WORKFLOW_STEPS_FILE}")
@@ -466,14 +667,13 @@ def fetch_and_process_tool(tool: dict, gi: GalaxyInstance) -> dict | None:
     if not tool_id:
         return None
 
-    raw_tool_url = f"{GALAXY_URL}/api/tools/{tool_id}/raw_tool_source"
-    resp = get_with_retry(raw_tool_url, params={"key": GALAXY_API_KEY})
-    if resp is None:
+    raw_source = fetch_raw_tool_source(tool_id)
+    if raw_source is None:
         logger.info(f"Giving up on tool {tool_id}")
         return None
 
     try:
-        root = ET.fromstring(resp.text)
+        root = etree.fromstring(raw_source, parser=TOOL_XML_PARSER)
         help_elem = root.find("help")
         help_text = (
             help_elem.text.strip() if (help_elem is not None and help_elem.text) else ""
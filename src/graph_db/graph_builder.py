@@ -1,14 +1,101 @@
-import json
+import orjson
 from src.graph_db.neo4j_manager import Neo4jManager
 from src.utils.embeddings import EmbeddingService
 from src.utils.logger import get_logger
-from tqdm import tqdm
 
 logger = get_logger("graph_builder")
 
+# Cypher used by the loaders, defined once so each call passes the same query text
+
+# Distinct formats are created once up front, so the tool load below only MATCHes them
+FILE_FORMATS_QUERY = """
+    UNWIND $batch AS name
+    MERGE (:FileFormat {name: name})
+"""
+
+# Tool, Categories and FileFormat relationships (Input/Output) in one pass per row:
+# each batch is sent once and each Tool is looked up once
+TOOL_QUERY = """
+    UNWIND $batch AS row
+    MERGE (t:Tool {id: row.tool_id})
+    SET t.name = row.name,
+        t.description = row.description,
+        t.version = row.version,
+        t.help_text = row.help,
+        t.embedding = row.embedding,
+        t.updated_at = timestamp()
+    
+    FOREACH (cat_name IN coalesce(row.categories, []) |
+        MERGE (c:Category {name: cat_name})
+        MERGE (t)-[:BELONGS_TO]->(c)
+    )
+    
+    WITH t, row
+    CALL {
+        WITH t, row
+        UNWIND row.input_formats AS fmt
+        MATCH (f:FileFormat {name: fmt})
+        MERGE (t)-[:ACCEPTS_INPUT]->(f)
+    }
+    
+    CALL {
+        WITH t, row
+        UNWIND row.output_formats AS fmt
+        MATCH (f:FileFormat {name: fmt})
+        MERGE (t)-[:PRODUCES_OUTPUT]->(f)
+    }
+"""
+
+WORKFLOW_QUERY = """
+    UNWIND $batch AS row
+    MERGE (w:Workflow {id: row.id})
+    SET w.name = row.name,
+        w.num_steps = row.number_of_steps,
+        w.embedding = row.embedding
+"""
+
+# Steps are the largest load, so the whole list is sent once and the server commits it
+# in chunks of STEPS_TX_ROWS rows (auto-commit only, hence execute_query)
+STEPS_TX_ROWS = 5000
+
+STEPS_QUERY = f"""
+    UNWIND $batch AS row
+    CALL {{
+        WITH row
+        MERGE (ws:WorkflowStep {{step_id: row.step_id}})
+        SET ws.step_number = row.step_number
+        
+        WITH ws, row
+        MATCH (w:Workflow {{id: row.workflow_id}})
+        MERGE (w)-[:HAS_STEP]->(ws)
+        
+        WITH ws, row
+        WHERE row.tool_id IS NOT NULL
+        MATCH (t:Tool {{id: row.tool_id}})
+        MERGE (ws)-[:USES_TOOL]->(t)
+    }} IN TRANSACTIONS OF {STEPS_TX_ROWS} ROWS
+"""
+
+# Sort each workflow's steps once and link neighbours, instead of a steps x steps self-join;
+# only consecutive step numbers are linked, as before
+LINK_STEPS_QUERY = """
+    MATCH (w:Workflow)-[:HAS_STEP]->(ws:WorkflowStep)
+    WITH w, ws ORDER BY ws.step_number
+    WITH w, collect(ws) AS steps
+    UNWIND range(0, size(steps) - 2) AS i
+    WITH steps[i] AS ws1, steps[i + 1] AS ws2
+    WHERE ws2.step_number = ws1.step_number + 1
+    MERGE (ws1)-[:NEXT_STEP]->(ws2)
+"""
+
+def read_json(path):
+    """Reads a JSON file with orjson, parsing straight from the raw bytes."""
+    with open(path, "rb") as f:
+        return orjson.loads(f.read())
+
 class GraphBuilder:
     def __init__(self):
-        self.neo4j = Neo4jManager()
+        self.neo4j = Neo4jManager.instance()
         self.embedder = EmbeddingService()
 
     def clear_database(self):
@@ -25,6 +112,10 @@ class GraphBuilder:
             "CREATE CONSTRAINT FOR (ws:WorkflowStep) REQUIRE ws.step_id IS UNIQUE",
             "CREATE CONSTRAINT FOR (f:FileFormat) REQUIRE f.name IS UNIQUE",
             "CREATE CONSTRAINT FOR (c:Category) REQUIRE c.name IS UNIQUE",
+            # Tools are also looked up by name (e.g. tests/test_graph_traversal.py)
+            "CREATE INDEX tool_name IF NOT EXISTS FOR (t:Tool) ON (t.name)",
+            # HybridSearch filters input formats with CONTAINS, which only a text index serves
+            "CREATE TEXT INDEX fileformat_name_text IF NOT EXISTS FOR (f:FileFormat) ON (f.name)",
         ]
         self.neo4j.create_constraints(constraints)
         
@@ -59,105 +150,51 @@ class GraphBuilder:
     def load_tools(self, tools_file):
         """Loads tools from JSON and creates nodes/relationships."""
         logger.info(f"Loading tools from {tools_file}...")
-        with open(tools_file, "r", encoding="utf-8") as f:
-            tools = json.load(f)
+        tools = read_json(tools_file)
 
         # Generate Embeddings
         logger.info("Generating embeddings for tools...")
-        for tool in tqdm(tools, desc="Embedding Tools"):
-            text_to_embed = f"{tool.get('name', '')} {tool.get('description', '')} {tool.get('help', '')[:500]}"
-            tool['embedding'] = self.embedder.generate_embedding(text_to_embed)
-
-        # Create Tools
-        query_tool = """
-        UNWIND $batch AS row
-        MERGE (t:Tool {id: row.tool_id})
-        SET t.name = row.name,
-            t.description = row.description,
-            t.version = row.version,
-            t.help_text = row.help,
-            t.embedding = row.embedding
-        """
-        self.neo4j.execute_batch(query_tool, tools)
-
-        # Create Categories and Relationships
-        query_category = """
-        UNWIND $batch AS row
-        MATCH (t:Tool {id: row.tool_id})
-        UNWIND row.categories AS cat_name
-        MERGE (c:Category {name: cat_name})
-        MERGE (t)-[:BELONGS_TO]->(c)
-        """
-        self.neo4j.execute_batch(query_category, tools)
-
-        # Create FileFormats and Relationships (Input/Output)
-        query_formats = """
-        UNWIND $batch AS row
-        MATCH (t:Tool {id: row.tool_id})
-        
-        FOREACH (fmt IN row.input_formats | 
-            MERGE (f:FileFormat {name: fmt})
-            MERGE (t)-[:ACCEPTS_INPUT]->(f)
-        )
-        
-        FOREACH (fmt IN row.output_formats | 
-            MERGE (f:FileFormat {name: fmt})
-            MERGE (t)-[:PRODUCES_OUTPUT]->(f)
-        )
-        """
-        self.neo4j.execute_batch(query_formats, tools)
+        texts = [
+            f"{tool.get('name', '')} {tool.get('description', '')} {tool.get('help', '')[:500]}"
+            for tool in tools
+        ]
+        for tool, embedding in zip(tools, self.embedder.generate_embeddings_batch(texts)):
+            tool['embedding'] = embedding
+
+        # FileFormats are shared across tools, so create them before the per-tool batches
+        formats = {
+            fmt
+            for tool in tools
+            for fmt in (tool.get('input_formats') or []) + (tool.get('output_formats') or [])
+            if fmt
+        }
+        self.neo4j.execute_batch(FILE_FORMATS_QUERY, sorted(formats))
+
+        # Create Tools, Categories and FileFormat Relationships (Input/Output)
+        self.neo4j.execute_batch(TOOL_QUERY, tools)
         logger.info("Tools loaded successfully.")
 
     def load_workflows(self, workflows_file, steps_file):
         """Loads workflows and steps."""
         logger.info(f"Loading workflows from {workflows_file}...")
-        with open(workflows_file, "r", encoding="utf-8") as f:
-            workflows = json.load(f)
-        
-        with open(steps_file, "r", encoding="utf-8") as f:
-            steps = json.load(f)
+        workflows = read_json(workflows_file)
+        steps = read_json(steps_file)
 
         # Generate Embeddings for Workflows
         logger.info("Generating embeddings for workflows...")
-        for wf in tqdm(workflows, desc="Embedding Workflows"):
-            text_to_embed = f"{wf.get('name', '')}"
-            wf['embedding'] = self.embedder.generate_embedding(text_to_embed)
+        texts = [f"{wf.get('name', '')}" for wf in workflows]
+        for wf, embedding in zip(workflows, self.embedder.generate_embeddings_batch(texts)):
+            wf['embedding'] = embedding
 
         # Create Workflows
-        query_workflow = """
-        UNWIND $batch AS row
-        MERGE (w:Workflow {id: row.id})
-        SET w.name = row.name,
-            w.num_steps = row.number_of_steps,
-            w.embedding = row.embedding
-        """
-        self.neo4j.execute_batch(query_workflow, workflows)
+        self.neo4j.execute_batch(WORKFLOW_QUERY, workflows)
 
         # Create WorkflowSteps
-        query_steps = """
-        UNWIND $batch AS row
-        MERGE (ws:WorkflowStep {step_id: row.step_id})
-        SET ws.step_number = row.step_number
-        
-        WITH ws, row
-        MATCH (w:Workflow {id: row.workflow_id})
-        MERGE (w)-[:HAS_STEP]->(ws)
-        
-        WITH ws, row
-        WHERE row.tool_id IS NOT NULL
-        MATCH (t:Tool {id: row.tool_id})
-        MERGE (ws)-[:USES_TOOL]->(t)
-        """
-        self.neo4j.execute_batch(query_steps, steps)
+        logger.info(f"Loading {len(steps)} workflow steps...")
+        self.neo4j.execute_query(STEPS_QUERY, {"batch": steps})
         
         # Link Steps (NEXT_STEP)
-        query_link_steps = """
-        MATCH (w:Workflow)-[:HAS_STEP]->(ws1:WorkflowStep)
-        MATCH (w)-[:HAS_STEP]->(ws2:WorkflowStep)
-        WHERE ws2.step_number = ws1.step_number + 1
-        MERGE (ws1)-[:NEXT_STEP]->(ws2)
-        """
-        self.neo4j.execute_query(query_link_steps)
+        self.neo4j.execute_query(LINK_STEPS_QUERY)
         
         logger.info("Workflows loaded successfully.")
 
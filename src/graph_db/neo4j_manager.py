@@ -1,12 +1,28 @@
+import time
+from contextlib import contextmanager
 from neo4j import GraphDatabase
+from neo4j.exceptions import TransientError
 from config import settings
 
+# Adaptive batching: batches faster than this grow (doubling up to MAX_BATCH_SIZE, or up to
+# an explicit batch_size); a batch that still fails with a transient error after the
+# driver's retries is halved
+FAST_BATCH_SECONDS = 0.5
+MAX_BATCH_SIZE = 50000
+
 class Neo4jManager:
+    # Process-wide manager handed out by instance(), and how many components hold it
+    _instance = None
+    _instance_refs = 0
+
+    # Connection settings, read once at import
+    uri = settings.NEO4J_URI
+    user = settings.NEO4J_USER
+    password = settings.NEO4J_PASSWORD
+    # Naming the database up front lets sessions skip the home-database lookup
+    database = settings.NEO4J_DATABASE
     
     def __init__(self):
-        self.uri = settings.NEO4J_URI
-        self.user = settings.NEO4J_USER
-        self.password = settings.NEO4J_PASSWORD
         self._driver = None
         try:
             self.connect()
@@ -15,29 +31,92 @@ class Neo4jManager:
             print(f"Error: Could not connect to Neo4j. Error: {e}")
             raise
     
+    @classmethod
+    def instance(cls):
+        """
+        Return the shared manager so every component reuses one driver and connection pool.
+        Each call takes a reference; the driver is only closed once every holder has called close().
+        """
+        if cls._instance is None:
+            manager = cls()
+            # Fail fast on bad credentials/URI once, instead of on the first query of each component
+            manager._driver.verify_connectivity()
+            cls._instance = manager
+        else:
+            cls._instance.connect()
+        cls._instance_refs += 1
+        return cls._instance
+
     def connect(self):
         if self._driver is None:
-            self._driver = GraphDatabase.driver(self.uri, auth=(self.user, self.password))
+            self._driver = GraphDatabase.driver(
+                self.uri,
+                auth=(self.user, self.password),
+                max_connection_pool_size=settings.NEO4J_MAX_CONNECTION_POOL_SIZE
+            )
     
     def close(self):
+        if self is Neo4jManager._instance:
+            Neo4jManager._instance_refs -= 1
+            if Neo4jManager._instance_refs > 0:
+                return
+            Neo4jManager._instance_refs = 0
         if self._driver is not None:
             self._driver.close()
             self._driver = None
             print("Neo4j connection closed.")
     
-    def execute_query(self, query, parameters=None):
+    @contextmanager
+    def session_scope(self, **config):
+        """
+        Open one session for a sequence of queries, e.g. to pass to execute_query(session=...),
+        so they share a pooled connection instead of each checking one out.
+        """
         assert self._driver is not None, "Driver not initialized"
-        with self._driver.session() as session:
+        with self._driver.session(database=self.database, **config) as session:
+            yield session
+
+    def execute_query(self, query, parameters=None, session=None):
+        """Run an auto-commit query and return its records, on `session` if one is given."""
+        if session is not None:
+            return [record for record in session.run(query, parameters)]
+        with self.session_scope() as session:
             result = session.run(query, parameters)
             return [record for record in result]
 
+    def execute_read(self, work, *args):
+        """
+        Run a unit of work inside a single managed read transaction.
+        `work` receives the transaction and must consume its results before returning,
+        e.g. `lambda tx: list(tx.run(query))`. Records are pulled in one round trip per query.
+        """
+        assert self._driver is not None, "Driver not initialized"
+        with self._driver.session(database=self.database, fetch_size=-1) as session:
+            return session.execute_read(work, *args)
+
     def create_constraints(self, constraints):
         """
         Apply a list of Cypher constraints to the database.
         Example constraint: "CREATE CONSTRAINT FOR (t:Tool) REQUIRE t.id IS UNIQUE"
+        All statements are first sent in one schema transaction (one commit); if any of them
+        fails, e.g. because a constraint without IF NOT EXISTS already exists, they are
+        re-applied one by one so the remaining ones still take effect.
         """
         assert self._driver is not None, "Driver not initialized"
-        with self._driver.session() as session:
+
+        def apply_all(tx):
+            for constraint in constraints:
+                tx.run(constraint).consume()
+
+        with self._driver.session(database=self.database) as session:
+            try:
+                session.execute_write(apply_all)
+                for constraint in constraints:
+                    print(f"Applied constraint: {constraint}")
+                return
+            except Exception as e:
+                print(f"Note: Applying constraints together failed ({e}); applying individually.")
+
             for constraint in constraints:
                 try:
                     session.run(constraint)
@@ -45,17 +124,44 @@ class Neo4jManager:
                 except Exception as e:
                     print(f"Note: Constraint might already exist or failed: {e}")
 
-    def execute_batch(self, query, data, batch_size=1000):
+    def execute_batch(self, query, data, batch_size=None):
         """
         Execute a query in batches.
         The query should expect a parameter named 'batch'.
         Example: "UNWIND $batch AS row CREATE (n:Node {id: row.id})"
+        Each batch runs in one managed write transaction, retried by the driver on transient errors.
+
+        `batch_size` defaults to settings.NEO4J_BATCH_SIZE. It doubles after every batch
+        that commits within FAST_BATCH_SECONDS, and is halved and the batch retried when
+        it keeps failing with a TransientError (e.g. memory pool limits).
+        An explicit `batch_size` is an upper bound: it can shrink but never grows past it,
+        so callers that cap transaction size to bound server heap keep that cap.
         """
         assert self._driver is not None, "Driver not initialized"
-        with self._driver.session() as session:
+        max_batch_size = batch_size or MAX_BATCH_SIZE
+        batch_size = batch_size or settings.NEO4J_BATCH_SIZE
+
+        def write_batch(tx, batch):
+            tx.run(query, {"batch": batch}).consume()
+
+        with self._driver.session(database=self.database) as session:
             total = len(data)
             print(f"Starting batch execution for {total} records...")
-            for i in range(0, total, batch_size):
+            i = 0
+            while i < total:
                 batch = data[i : i + batch_size]
-                session.run(query, {"batch": batch})
-                print(f"Processed batch {i // batch_size + 1}/{(total + batch_size - 1) // batch_size}")
\ No newline at end of file
+                start = time.perf_counter()
+                try:
+                    session.execute_write(write_batch, batch)
+                except TransientError as e:
+                    if batch_size == 1:
+                        raise
+                    batch_size = max(1, batch_size // 2)
+                    print(f"Batch of {len(batch)} failed ({e.code}); retrying with batch size {batch_size}")
+                    continue
+                elapsed = time.perf_counter() - start
+
+                i += len(batch)
+                print(f"Processed {i}/{total} records (batch size {len(batch)}, {elapsed:.2f}s)")
+                if elapsed < FAST_BATCH_SECONDS:
+                    batch_size = min(batch_size * 2, max_batch_size)
@@ -12,18 +12,47 @@ class GlobalSearch:
     Uses the LLM to select the best matching community for a high-level query.
     """
     def __init__(self):
-        self.neo4j = Neo4jManager()
+        self.neo4j = Neo4jManager.instance()
+        self.embedder = EmbeddingService()
         if not settings.GEMINI_API_KEY:
              raise ValueError("GEMINI_API_KEY is not set.")
         genai.configure(api_key=settings.GEMINI_API_KEY)
         self.model = genai.GenerativeModel('gemini-2.5-pro')
 
+    def fetch_candidate_communities(self, query, top_k=10):
+        """
+        Pre-ranks communities by summary embedding so only the top_k reach the LLM prompt.
+        Communities without a summary embedding are never returned by the vector index,
+        so they are always appended to the top_k. Falls back to every community if the
+        query can't be embedded or the community_embeddings index is missing/empty.
+        """
+        query_embedding = self.embedder.generate_embedding(query)
+        if query_embedding:
+            cypher = """
+            CALL db.index.vector.queryNodes('community_embeddings', $k, $embedding)
+            YIELD node, score
+            RETURN node.id AS id, node.name AS name, node.summary AS summary
+            """
+            try:
+                communities = self.neo4j.execute_query(cypher, {"k": top_k, "embedding": query_embedding})
+                if communities:
+                    unembedded = self.neo4j.execute_query(
+                        "MATCH (c:Community) WHERE c.embedding IS NULL "
+                        "RETURN c.id AS id, c.name AS name, c.summary AS summary"
+                    )
+                    seen = {c['id'] for c in communities}
+                    return list(communities) + [c for c in unembedded if c['id'] not in seen]
+            except Exception as e:
+                logger.warning(f"Community vector pre-filter unavailable, using all communities: {e}")
+
+        # Fetch all community summaries
+        cypher = "MATCH (c:Community) RETURN c.id AS id, c.name AS name, c.summary AS summary"
+        return self.neo4j.execute_query(cypher)
+
     def search(self, query):
         logger.info(f"Performing Global Search for: '{query}'")
         
-        # Fetch all community summaries
-        cypher = "MATCH (c:Community) RETURN c.id AS id, c.name AS name, c.summary AS summary"
-        communities = self.neo4j.execute_query(cypher)
+        communities = self.fetch_candidate_communities(query)
         
         if not communities:
             return "No communities found in the graph."
@@ -57,7 +86,7 @@ class LocalSearch:
     Finds specific tools via Vector Search and explores their immediate neighborhood.
     """
     def __init__(self):
-        self.neo4j = Neo4jManager()
+        self.neo4j = Neo4jManager.instance()
         self.embedder = EmbeddingService()
 
     def search(self, query, top_k=3):
@@ -77,23 +106,28 @@ class LocalSearch:
         
         results = self.neo4j.execute_query(cypher, {"k": top_k, "embedding": query_embedding})
         
+        # Expand Neighborhood (1-hop) for all hits in one query instead of one per tool
+        context_query = """
+        UNWIND $ids AS id
+        MATCH (t:Tool {id: id})
+        OPTIONAL MATCH (t)-[:ACCEPTS_INPUT]->(i:FileFormat)
+        OPTIONAL MATCH (t)-[:PRODUCES_OUTPUT]->(o:FileFormat)
+        OPTIONAL MATCH (w:Workflow)-[:HAS_STEP]->(:WorkflowStep)-[:USES_TOOL]->(t)
+        RETURN id,
+               collect(DISTINCT i.name) AS inputs, 
+               collect(DISTINCT o.name) AS outputs, 
+               collect(DISTINCT w.name)[0..3] AS workflows
+        """
+        contexts = {
+            r['id']: {"inputs": r['inputs'], "outputs": r['outputs'], "workflows": r['workflows']}
+            for r in self.neo4j.execute_query(context_query, {"ids": [tool['id'] for tool in results]})
+        }
+        
         enhanced_results = []
         for tool in results:
-            # Expand Neighborhood (1-hop)
-            context_query = """
-            MATCH (t:Tool {id: $id})
-            OPTIONAL MATCH (t)-[:ACCEPTS_INPUT]->(i:FileFormat)
-            OPTIONAL MATCH (t)-[:PRODUCES_OUTPUT]->(o:FileFormat)
-            OPTIONAL MATCH (w:Workflow)-[:HAS_STEP]->(:WorkflowStep)-[:USES_TOOL]->(t)
-            RETURN collect(DISTINCT i.name) AS inputs, 
-                   collect(DISTINCT o.name) AS outputs, 
-                   collect(DISTINCT w.name)[0..3] AS workflows
-            """
-            context = self.neo4j.execute_query(context_query, {"id": tool['id']})[0]
-            
             enhanced_results.append({
                 "tool": tool,
-                "context": context
+                "context": contexts.get(tool['id'], {"inputs": [], "outputs": [], "workflows": []})
             })
             
         return enhanced_results
@@ -103,7 +137,7 @@ class HybridSearch:
     Combines Vector Search with Graph Filters.
     """
     def __init__(self):
-        self.neo4j = Neo4jManager()
+        self.neo4j = Neo4jManager.instance()
         self.embedder = EmbeddingService()
 
     def search(self, query, input_format=None, top_k=5):
@@ -116,14 +150,20 @@ class HybridSearch:
         CALL db.index.vector.queryNodes('tool_embeddings', $k, $embedding)
         YIELD node, score
         """
-        
-        # Apply Graph Filter if provided
+        params = {"k": top_k, "embedding": query_embedding}
+
+        # Apply Graph Filter if provided (as a parameter: no Cypher injection, one cached plan).
+        # CONTAINS on FileFormat.name is served by the fileformat_name_text index;
+        # EXISTS keeps one row per Tool.
         if input_format:
-            cypher += f"""
-            MATCH (node)-[:ACCEPTS_INPUT]->(f:FileFormat)
-            WHERE f.name CONTAINS '{input_format}'
+            cypher += """
+            WHERE EXISTS {
+                MATCH (node)-[:ACCEPTS_INPUT]->(f:FileFormat)
+                WHERE f.name CONTAINS $input_format
+            }
             """
+            params["input_format"] = input_format
             
         cypher += " RETURN node.name AS name, node.description AS description, score"
         
-        return self.neo4j.execute_query(cypher, {"k": top_k, "embedding": query_embedding})
+        return self.neo4j.execute_query(cypher, params)
@@ -1,7 +1,17 @@
 import requests
+from requests.adapters import HTTPAdapter
 from config import settings
 import time
 
+# Legacy helper: nothing imports this module (EmbeddingService in src/utils/embeddings.py
+# is used instead), and config.settings does not define HF_EMBEDDING_API_URL.
+
+# Module-level keep-alive session shared by every get_embedding call, with one pooled adapter
+_session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=0)
+_session.mount("https://", _adapter)
+_session.mount("http://", _adapter)
+
 def get_embedding(text, max_retries=3):
     if not text or not isinstance(text, str):
         return None
@@ -12,7 +22,7 @@ def get_embedding(text, max_retries=3):
     
     for attempt in range(max_retries):
         try:
-            response = requests.post(api_url, headers=headers,json=payload)
+            response = _session.post(api_url, headers=headers,json=payload)
             if response.status_code == 200:
                 return response.json()
             else:
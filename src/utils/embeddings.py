@@ -1,10 +1,23 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import requests
+from requests.adapters import HTTPAdapter
 from config import settings
 from src.utils.logger import get_logger
 import time
 
 logger = get_logger("embedding_service")
 
+# Concurrent HF Inference batch requests, and the minimum spacing between request starts
+EMBEDDING_MAX_WORKERS = 4
+EMBEDDING_MIN_INTERVAL = 0.2
+
+# LRU of single-text embeddings shared by every EmbeddingService: {(api_url, text): embedding}
+EMBEDDING_CACHE_SIZE = 1024
+_embedding_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
 class EmbeddingService:
     def __init__(self):
         self.api_url = settings.HF_EMBEDDING_URL
@@ -14,17 +27,50 @@ class EmbeddingService:
             logger.warning("HF_EMBEDDING_URL or HF_API_TOKEN not set. Embeddings will be empty.")
             self.api_url = None
 
+        # Keep-alive session so repeated calls reuse the TLS connection to the endpoint;
+        # retries stay in the loops below, which know about HF's 503 model-loading responses
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=0)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+        self._rate_lock = threading.Lock()
+        self._next_request_at = 0.0
+
     def generate_embedding(self, text):
-        """Generates embedding for a single string using HF Inference API."""
+        """
+        Generates embedding for a single string using HF Inference API.
+        Successful results are kept in a process-wide LRU (embeddings are a pure function
+        of endpoint and text), so repeated queries skip the HTTP round trip.
+        """
         if not text or not self.api_url:
             return []
-        
+
+        key = (self.api_url, text)
+        with _cache_lock:
+            cached = _embedding_cache.get(key)
+            if cached is not None:
+                _embedding_cache.move_to_end(key)
+                return list(cached)
+
+        embedding = self._request_embedding(text)
+        if embedding:
+            # Failures ([]) are not cached, so they are retried on the next call
+            with _cache_lock:
+                # Store a private copy; callers own the list they are returned
+                _embedding_cache[key] = list(embedding)
+                _embedding_cache.move_to_end(key)
+                if len(_embedding_cache) > EMBEDDING_CACHE_SIZE:
+                    _embedding_cache.popitem(last=False)
+        return embedding
+
+    def _request_embedding(self, text):
         headers = {"Authorization": f"Bearer {self.api_token}"}
         payload = {"inputs": text}
         
         for attempt in range(3):
             try:
-                response = requests.post(self.api_url, headers=headers, json=payload, timeout=10)
+                response = self._session.post(self.api_url, headers=headers, json=payload, timeout=10)
                 if response.status_code == 200:
                     data = response.json()
                     if isinstance(data, list):
@@ -44,28 +90,64 @@ class EmbeddingService:
                 time.sleep(1)
         return []
 
-    def generate_embeddings_batch(self, texts, batch_size=10):
-        """Generates embeddings for a list of strings."""
-        if not texts or not self.api_url:
-            return [[] for _ in texts]
-            
+    def _throttle(self):
+        """Spaces request starts at least EMBEDDING_MIN_INTERVAL apart across all threads."""
+        with self._rate_lock:
+            now = time.monotonic()
+            wait = self._next_request_at - now
+            self._next_request_at = max(now, self._next_request_at) + EMBEDDING_MIN_INTERVAL
+        if wait > 0:
+            time.sleep(wait)
+
+    def _post_batch(self, texts):
+        """Embeds one batch of non-empty texts. Returns a list of embeddings, or None on failure."""
         headers = {"Authorization": f"Bearer {self.api_token}"}
-        embeddings = []
-        
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i : i + batch_size]
-            payload = {"inputs": batch}
+        payload = {"inputs": texts}
+        for attempt in range(3):
+            self._throttle()
             try:
-                response = requests.post(self.api_url, headers=headers, json=payload, timeout=30)
+                response = self._session.post(self.api_url, headers=headers, json=payload, timeout=30)
                 if response.status_code == 200:
                     data = response.json()
-                    embeddings.extend(data)
+                    if isinstance(data, list) and len(data) == len(texts):
+                        return data
+                    logger.error(f"HF Batch API returned {len(data) if isinstance(data, list) else 'non-list'} results for {len(texts)} inputs")
+                    return None
+                elif response.status_code == 503:
+                    # Model loading
+                    time.sleep(5)
+                    continue
                 else:
                     logger.error(f"HF Batch API Error {response.status_code}: {response.text}")
-                    embeddings.extend([[]] * len(batch))
+                    return None
             except Exception as e:
                 logger.error(f"Error in batch embedding: {e}")
-                embeddings.extend([[]] * len(batch))
-            time.sleep(0.2) # Rate limit protection
+                time.sleep(1)
+        return None
+
+    def generate_embeddings_batch(self, texts, batch_size=None):
+        """
+        Generates embeddings for a list of strings, `batch_size` texts per API call,
+        with up to EMBEDDING_MAX_WORKERS calls in flight.
+        Returns one embedding per input text, in order; empty texts and failed batches get [].
+        """
+        if not texts or not self.api_url:
+            return [[] for _ in texts]
+            
+        batch_size = batch_size or settings.EMBEDDING_BATCH_SIZE
+        embeddings = [[] for _ in texts]
+        
+        # Empty strings are skipped, as in generate_embedding
+        indexed = [(i, text) for i, text in enumerate(texts) if text]
+        batches = [indexed[start : start + batch_size] for start in range(0, len(indexed), batch_size)]
+        
+        # Requests are network-bound, so overlap them; _throttle keeps the overall request rate bounded
+        with ThreadPoolExecutor(max_workers=EMBEDDING_MAX_WORKERS) as pool:
+            results = pool.map(lambda batch: self._post_batch([text for _, text in batch]), batches)
+            for batch, data in zip(batches, results):
+                if data is None:
+                    continue
+                for (i, _), emb in zip(batch, data):
+                    embeddings[i] = emb
             
         return embeddings
@@ -1,19 +1,24 @@
 
+import functools
 import logging
 import sys
 
+@functools.lru_cache(maxsize=None)
 def get_logger(name):
     """
-    Configures and returns a standard logger.
+    Configures and returns a standard logger (memoized per name).
     """
     logger = logging.getLogger(name)
     if not logger.handlers:
         logger.setLevel(logging.INFO)
+        # Default datefmt on purpose: the milliseconds are needed to time the concurrent workers
         formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
         
         # StreamHandler to output logs to the console
         handler = logging.StreamHandler(sys.stdout)
         handler.setFormatter(formatter)
         logger.addHandler(handler)
+        # Our handler already writes the record; don't emit it again via any root handlers
+        logger.propagate = False
         
     return logger
\ No newline at end of file
@@ -0,0 +1,36 @@
+import numpy as np
+
+# Rows per similarity tile; peak memory is O(SIMILARITY_TILE_SIZE * N)
+SIMILARITY_TILE_SIZE = 512
+
+def normalize_rows(matrix):
+    """L2-normalizes each row in place (all-zero rows are left as is) and returns the matrix."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+def similar_pairs(matrix, threshold, tile_size=SIMILARITY_TILE_SIZE):
+    """
+    Finds all pairs of rows whose cosine similarity exceeds `threshold`.
+    `matrix` must be unit-normalized (see normalize_rows), so similarity is a plain inner product.
+    Only the strict upper triangle is computed, one row tile at a time, so the
+    full N x N similarity matrix is never materialized.
+    Returns:
+        np.ndarray: row indices (r)
+        np.ndarray: column indices (c), with r < c
+        np.ndarray: similarities
+    """
+    all_rows, all_cols, all_weights = [], [], []
+    for start in range(0, len(matrix), tile_size):
+        # Symmetric, so each tile only needs the columns from its own start onwards
+        block = matrix[start:start + tile_size] @ matrix[start:].T
+        rows, cols = np.nonzero(np.triu(block > threshold, k=1))
+        all_weights.append(block[rows, cols])
+        all_rows.append(rows + start)
+        all_cols.append(cols + start)
+
+    if not all_rows:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0, dtype=matrix.dtype)
+    return np.concatenate(all_rows), np.concatenate(all_cols), np.concatenate(all_weights)
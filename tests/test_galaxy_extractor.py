@@ -0,0 +1,59 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# The extractor refuses to import without a Galaxy key; no request is made in these tests
+os.environ.setdefault("GALAXY_API_KEY", "test-key")
+
+import orjson
+import pytest
+
+from src.data_extraction import galaxy_extractor as extractor
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(extractor, "DATA_CACHE_DIR", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def etags_file(tmp_path, monkeypatch):
+    path = tmp_path / "github_etags.json"
+    monkeypatch.setattr(extractor, "GITHUB_ETAGS_FILE", str(path))
+    monkeypatch.setattr(extractor, "_github_etags", None)
+    return path
+
+
+def test_cache_round_trip(cache_dir):
+    url = "https://example.org/api/tools/x/raw_tool_source"
+    extractor.write_cache("galaxy_tools", url, b"<tool/>")
+
+    assert extractor.read_cache("galaxy_tools", url) == b"<tool/>"
+    assert extractor.read_cache("galaxy_tools", "https://other.org/api/tools/x/raw_tool_source") is None
+    assert not [p for p in (cache_dir / "galaxy_tools").iterdir() if p.suffix == ".tmp"]
+
+
+def test_cache_entry_expires(cache_dir):
+    extractor.write_cache("github_raw", "key", b"data")
+    path = extractor.cache_path("github_raw", "key")
+    os.utime(path, (0, 0))
+
+    assert extractor.read_cache("github_raw", "key", ttl=60) is None
+    assert extractor.read_cache("github_raw", "key", ttl=None) == b"data"
+
+
+def test_github_etags_saved_and_reloaded(etags_file, monkeypatch):
+    assert extractor.github_etag("https://api.github.com/a") is None
+
+    extractor.set_github_etag("https://api.github.com/a", '"abc"')
+    extractor.save_github_etags()
+    assert orjson.loads(etags_file.read_bytes()) == {"https://api.github.com/a": '"abc"'}
+
+    monkeypatch.setattr(extractor, "_github_etags", None)
+    assert extractor.github_etag("https://api.github.com/a") == '"abc"'
+
+
+def test_github_etags_ignore_corrupt_sidecar(etags_file):
+    etags_file.write_bytes(b"not json")
+    assert extractor.github_etag("https://api.github.com/a") is None
@@ -0,0 +1,120 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pytest
+
+from config import settings
+from src.community_detection.graph_projector import EMBEDDING_DIM, GraphData, GraphProjector
+
+
+class FakeNeo4j:
+    uri = "bolt://example:7687"
+    database = "neo4j"
+
+
+def make_projector(graph_data=None):
+    """GraphProjector without a Neo4j connection; fetch_all_graph_data returns `graph_data`."""
+    projector = GraphProjector.__new__(GraphProjector)
+    projector.neo4j = FakeNeo4j()
+    projector._full_graph = None
+    if graph_data is not None:
+        projector.fetch_all_graph_data = lambda filter_tool_ids=None: graph_data
+    return projector
+
+
+@pytest.fixture
+def projector():
+    matrix = np.array([[1.0, 0.0], [1.0, 0.0], [0.0, 1.0]], dtype=np.float32)
+    cooccurrences = [
+        {"source": "a", "target": "b", "weight": 2},
+        {"source": "b", "target": "c", "weight": 1},
+        {"source": "a", "target": "z", "weight": 5},  # unknown tool, skipped
+    ]
+    io_connections = [
+        {"source": "a", "target": "c", "weight": 3},
+        {"source": "c", "target": "b", "weight": 1},
+    ]
+    return make_projector(GraphData(["a", "b", "c"], matrix, cooccurrences, io_connections))
+
+
+def edges_by_names(G):
+    names = G.vs["name"]
+    return {
+        frozenset((names[e.source], names[e.target])): (e["weight"], e["type"])
+        for e in G.es
+    }
+
+
+def test_full_graph_sums_weights_and_keeps_type_precedence(projector):
+    edges = edges_by_names(projector.build_weighted_graph())
+
+    assert set(edges) == {frozenset("ab"), frozenset("bc"), frozenset("ac")}
+    # semantic (1.0) + workflow (2 * 1.0): semantic wins
+    assert edges[frozenset("ab")] == (pytest.approx(3.0), "semantic")
+    # workflow (1 * 1.0) + io (1 * 0.5), reported in either direction: workflow wins
+    assert edges[frozenset("bc")] == (pytest.approx(1.5), "workflow")
+    # io only (3 * 0.5)
+    assert edges[frozenset("ac")] == (pytest.approx(1.5), "io")
+
+
+def test_full_graph_is_a_copy_of_the_cache(projector):
+    G = projector.build_weighted_graph()
+    G.es["weight"] = [1.0] * G.ecount()
+
+    cached = projector.build_full_weighted_graph()
+    assert G is not cached
+    assert sorted(cached.es["weight"]) == pytest.approx([1.5, 1.5, 3.0])
+
+
+def test_filtered_graph_is_induced_subgraph(projector):
+    G = projector.build_weighted_graph(filter_tool_ids=["a", "b"])
+
+    assert sorted(G.vs["name"]) == ["a", "b"]
+    assert edges_by_names(G) == {frozenset("ab"): (pytest.approx(3.0), "semantic")}
+
+
+def test_empty_graph_without_embeddings():
+    projector = make_projector(GraphData([], np.empty((0, 2), dtype=np.float32), [], []))
+    assert projector.build_weighted_graph().vcount() == 0
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "DATA_CACHE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_embedding_cache_round_trip(cache_dir):
+    projector = make_projector()
+    stamp = projector._cache_key({"n": 2, "ts": 1234})
+    matrix = np.ones((2, EMBEDDING_DIM), dtype=np.float32)
+
+    projector._save_cached_embeddings(stamp, ["a", "b"], matrix)
+    tool_ids, loaded = projector._load_cached_embeddings(stamp)
+
+    assert tool_ids == ["a", "b"]
+    np.testing.assert_array_equal(loaded, matrix)
+
+
+def test_embedding_cache_is_scoped_to_the_database(cache_dir):
+    projector = make_projector()
+    stamp = projector._cache_key({"n": 2, "ts": 1234})
+    projector._save_cached_embeddings(stamp, ["a", "b"], np.ones((2, EMBEDDING_DIM), dtype=np.float32))
+
+    other = make_projector()
+    other.neo4j.database = "other"
+    assert other._load_cached_embeddings(other._cache_key({"n": 2, "ts": 1234})) is None
+    assert projector._load_cached_embeddings(projector._cache_key({"n": 2, "ts": 999})) is None
+
+
+def test_embedding_cache_skipped_without_updated_at(cache_dir):
+    projector = make_projector()
+    stamp = projector._cache_key({"n": 2, "ts": None})
+    assert stamp is None
+
+    projector._save_cached_embeddings(stamp, ["a", "b"], np.ones((2, EMBEDDING_DIM), dtype=np.float32))
+    assert list(cache_dir.iterdir()) == []
+    assert projector._load_cached_embeddings(stamp) is None
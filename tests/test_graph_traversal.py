@@ -1,5 +1,6 @@
 import sys
 import os
+from contextlib import ExitStack
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
@@ -11,8 +12,11 @@ logger = get_logger("test_traversal")
 
 class GraphTester:
     def __init__(self):
-        self.neo4j = Neo4jManager()
+        self.neo4j = Neo4jManager.instance()
         self.embedder = EmbeddingService()
+        # One session shared by every test query
+        self._scope = ExitStack()
+        self._session = self._scope.enter_context(self.neo4j.session_scope())
 
     def test_vector_search(self, query, top_k=3):
         """Find tools semantically similar to the query."""
@@ -26,7 +30,7 @@ class GraphTester:
         RETURN node.name AS name, node.description AS description, score
         """
         
-        results = self.neo4j.execute_query(cypher, {"k": top_k, "embedding": embedding})
+        results = self.neo4j.execute_query(cypher, {"k": top_k, "embedding": embedding}, session=self._session)
         for r in results:
             print(f"[Score: {r['score']:.4f}] {r['name']}")
         return results
@@ -41,7 +45,7 @@ class GraphTester:
         LIMIT 5
         """
         
-        results = self.neo4j.execute_query(cypher, {"tool_name": tool_name})
+        results = self.neo4j.execute_query(cypher, {"tool_name": tool_name}, session=self._session)
         if not results:
             print("No workflows found using this tool.")
         for r in results:
@@ -61,7 +65,7 @@ class GraphTester:
         LIMIT 3
         """
         
-        results = self.neo4j.execute_query(cypher, {"embedding": embedding, "format": input_format})
+        results = self.neo4j.execute_query(cypher, {"embedding": embedding, "format": input_format}, session=self._session)
         for r in results:
             print(f"[Score: {r['score']:.4f}] {r['name']}")
 
@@ -76,7 +80,7 @@ class GraphTester:
         RETURN node.name AS name, node.num_steps AS steps, score
         """
         
-        results = self.neo4j.execute_query(cypher, {"k": top_k, "embedding": embedding})
+        results = self.neo4j.execute_query(cypher, {"k": top_k, "embedding": embedding}, session=self._session)
         for r in results:
             print(f"[Score: {r['score']:.4f}] {r['name']} ({r['steps']} steps)")
         return results
@@ -91,7 +95,7 @@ class GraphTester:
         LIMIT 5
         """
         
-        results = self.neo4j.execute_query(cypher, {"tool_name": tool_name})
+        results = self.neo4j.execute_query(cypher, {"tool_name": tool_name}, session=self._session)
         if not results:
             print("No compatible next tools found.")
         for r in results:
@@ -108,11 +112,12 @@ class GraphTester:
         LIMIT 5
         """
         
-        results = self.neo4j.execute_query(cypher, {"cat_name": category_name})
+        results = self.neo4j.execute_query(cypher, {"cat_name": category_name}, session=self._session)
         for r in results:
             print(f"Tool: {r['tool']} [{r['category']}]")
 
     def close(self):
+        self._scope.close()
         self.neo4j.close()
 
 if __name__ == "__main__":
@@ -0,0 +1,40 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from src.utils.similarity import normalize_rows, similar_pairs
+
+
+def test_normalize_rows_unit_norm_and_zero_rows():
+    matrix = np.array([[3.0, 4.0], [0.0, 0.0], [1.0, 0.0]], dtype=np.float32)
+    result = normalize_rows(matrix)
+
+    assert result is matrix  # normalized in place
+    np.testing.assert_allclose(np.linalg.norm(result[[0, 2]], axis=1), 1.0, rtol=1e-6)
+    np.testing.assert_array_equal(result[1], [0.0, 0.0])
+
+
+def test_similar_pairs_matches_brute_force():
+    rng = np.random.default_rng(0)
+    matrix = normalize_rows(rng.standard_normal((50, 8)).astype(np.float32))
+    threshold = 0.3
+
+    # Small tiles so the result spans several tiles
+    rows, cols, weights = similar_pairs(matrix, threshold, tile_size=7)
+
+    full = matrix @ matrix.T
+    expected_rows, expected_cols = np.nonzero(np.triu(full > threshold, k=1))
+    expected = set(zip(expected_rows.tolist(), expected_cols.tolist()))
+
+    assert set(zip(rows.tolist(), cols.tolist())) == expected
+    assert len(rows) == len(expected)
+    assert np.all(rows < cols)
+    np.testing.assert_allclose(weights, full[rows, cols], rtol=1e-5)
+
+
+def test_similar_pairs_empty_matrix():
+    rows, cols, weights = similar_pairs(np.empty((0, 4), dtype=np.float32), 0.5)
+    assert len(rows) == len(cols) == len(weights) == 0
@@ -0,0 +1,26 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.community_detection.summarizer import CommunitySummarizer
+
+
+def test_trivial_summary_titles_from_member_names():
+    members = [
+        "Tool: bwa - Map short reads",
+        "Workflow: variant-calling - Call variants",
+    ]
+    title, summary = CommunitySummarizer.trivial_summary(members)
+
+    assert title == "bwa / variant-calling"
+    assert summary == " ".join(members)
+
+
+def test_trivial_summary_falls_back_to_raw_member():
+    title, _ = CommunitySummarizer.trivial_summary(["Tool:  - no name"])
+    assert title == "Tool:  - no name"
+
+
+def test_trivial_summary_empty():
+    assert CommunitySummarizer.trivial_summary([]) == ("Empty Community", "No members found.")
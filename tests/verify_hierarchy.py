@@ -1,7 +1,7 @@
 from src.graph_db.neo4j_manager import Neo4jManager
 
 def verify_hierarchy():
-    neo4j = Neo4jManager()
+    neo4j = Neo4jManager.instance()
     
     print("="*60)
     print("HIERARCHICAL COMMUNITY VERIFICATION")